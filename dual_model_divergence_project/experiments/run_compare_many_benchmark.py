@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules.divergence_detector import compare_answers, compare_many  # noqa: E402
+
+
+FRAGMENTS = [
+    "太阳系中最大的行星是木星",
+    "土星的体积也很大",
+    "X技术专利申请于2020年",
+    "X技术专利申请于2018年",
+    "该方案可离线执行",
+    "该方案不可离线执行",
+    "Autodesk patent filed in 2025",
+    "It verifies and cites language model outputs",
+    "It does not verify outputs",
+    "华为公司在2019年向国家知识产权局提交了通信专利申请",
+    "模型没有给出证据",
+    "模型给出了证据",
+]
+
+
+def _make_pairs(count: int, sentences: int, seed: int) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        a = "。".join(rng.choice(FRAGMENTS) for _ in range(sentences))
+        b = "。".join(rng.choice(FRAGMENTS) for _ in range(sentences))
+        pairs.append((a, b))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial compare_answers vs compare_many scaling.")
+    parser.add_argument("--pairs", type=int, default=2000)
+    parser.add_argument("--sentences", type=int, default=12)
+    parser.add_argument("--chunksize", type=int, default=32)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    pairs = _make_pairs(args.pairs, args.sentences, seed=7)
+
+    start = time.perf_counter()
+    serial = [compare_answers(a, b) for a, b in pairs]
+    serial_s = time.perf_counter() - start
+    print("| workers | seconds | pairs/s | speedup |")
+    print("|---|---|---|---|")
+    print(f"| serial | {serial_s:.2f} | {len(pairs) / serial_s:.0f} | 1.00x |")
+
+    workers = 2
+    while workers <= max(2, args.max_workers):
+        start = time.perf_counter()
+        results = list(compare_many(pairs, workers=workers, chunksize=args.chunksize))
+        elapsed = time.perf_counter() - start
+        if results != serial:
+            raise RuntimeError(f"compare_many(workers={workers}) diverged from the serial loop.")
+        print(f"| {workers} | {elapsed:.2f} | {len(pairs) / elapsed:.0f} | {serial_s / elapsed:.2f}x |")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from modules.database import DatabaseManager, question_hash  # noqa: E402
+
+
+def _run(db: DatabaseManager, writes: int, threads: int) -> float:
+    """Seconds for `writes` save_response + get_cached_response pairs split over threads."""
+    query_id = db.save_query("benchmark question")
+    per_thread = writes // threads
+
+    def _work():
+        for i in range(per_thread):
+            db.save_response(query_id, "GPT", f"answer {i}", usage_info="mode=live")
+            db.get_cached_response("benchmark question", "GPT", response_mode="live")
+
+    workers = [threading.Thread(target=_work) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start
+
+
+def _lookup_latency(rows: int, lookups: int) -> float:
+    """Seconds per cache hit (both models, one query) on a database with `rows` questions."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(str(Path(tmp) / "lookup.db"), persistent=True)
+        db.init_db()
+        with db._connect() as conn:
+            texts = [f"question {i}" for i in range(rows)]
+            conn.executemany(
+                "INSERT INTO questions(id, question_hash, question_text) VALUES (?, ?, ?)",
+                [(i + 1, question_hash(t), t) for i, t in enumerate(texts)],
+            )
+            conn.executemany("INSERT INTO runs(id, question_id) VALUES (?, ?)", [(i + 1, i + 1) for i in range(rows)])
+            conn.executemany(
+                "INSERT INTO model_responses(query_id, model_name, response_text, usage_info, question_hash, mode) "
+                "VALUES (?, ?, ?, 'mode=live', ?, 'live')",
+                [(i + 1, m, "answer", question_hash(t)) for i, t in enumerate(texts) for m in ("GPT", "Claude")],
+            )
+        start = time.perf_counter()
+        for i in range(lookups):
+            db.get_cached_answers(f"question {(i * 7919) % rows}", ["GPT", "Claude"], response_mode="live")
+        elapsed = time.perf_counter() - start
+        db.close()
+    return elapsed / lookups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call vs persistent DatabaseManager connections.")
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--lookup-rows", type=int, nargs="*", default=[1000, 100000])
+    args = parser.parse_args()
+
+    print("| mode | threads | writes | seconds | us per write+read |")
+    print("|---|---|---|---|---|")
+    for persistent in (False, True):
+        for threads in sorted({1, args.threads}):
+            with tempfile.TemporaryDirectory() as tmp:
+                db = DatabaseManager(str(Path(tmp) / "bench.db"), persistent=persistent)
+                db.init_db()
+                elapsed = _run(db, args.writes, threads)
+                db.close()
+            mode = "persistent" if persistent else "per-call"
+            done = args.writes // threads * threads
+            print(f"| {mode} | {threads} | {done} | {elapsed:.2f} | {elapsed / done * 1e6:.0f} |")
+
+    print()
+    print("| questions in DB | us per cache hit (both models) |")
+    print("|---|---|")
+    for rows in args.lookup_rows:
+        print(f"| {rows} | {_lookup_latency(rows, 1000) * 1e6:.0f} |")
+
+
+if __name__ == "__main__":
+    main()
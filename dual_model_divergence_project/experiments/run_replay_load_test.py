@@ -0,0 +1,108 @@
+import argparse
+import cProfile
+import pstats
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from main import run_pipeline  # noqa: E402
+from modules import model_invoker  # noqa: E402
+from modules.response_recorder import ResponseRecorder  # noqa: E402
+
+FRAGMENTS = [
+    "太阳系中最大的行星是木星",
+    "土星的体积也很大",
+    "X技术专利申请于2020年",
+    "X技术专利申请于2018年",
+    "该方案可离线执行",
+    "该方案不可离线执行",
+    "华为公司在2019年向国家知识产权局提交了通信专利申请",
+    "模型没有给出证据",
+    "模型给出了证据",
+]
+
+
+def _synthesize(path: str, questions: int, sentences: int, seed: int):
+    """Write a synthetic recording so the load test runs without any captured traffic."""
+    rng = random.Random(seed)
+    recorder = ResponseRecorder(path, mode="record")
+    for i in range(questions):
+        question = f"synthetic question {i}"
+        for model_name in model_invoker.PROVIDERS.select("default"):
+            answer = "。".join(rng.choice(FRAGMENTS) for _ in range(sentences)) + "。"
+            recorder.record(model_name, question, answer, latency=rng.uniform(0.4, 2.5))
+    recorder.close()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded provider traffic through run_pipeline.")
+    parser.add_argument("--replay", help="Recording file (default: a synthetic one).")
+    parser.add_argument("--synthetic-questions", type=int, default=50)
+    parser.add_argument("--sentences", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--speed", type=float, default=0.01, help="Latency multiplier (1 = recorded latency).")
+    parser.add_argument(
+        "--profile", action="store_true", help="Run requests serially under cProfile and print the top entries."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replay_path = args.replay
+        if replay_path is None:
+            replay_path = str(Path(tmp) / "synthetic.replay.db")
+            _synthesize(replay_path, args.synthetic_questions, args.sentences, seed=7)
+        recorder = ResponseRecorder(replay_path, mode="replay", latency_scale=args.speed)
+        questions = recorder.questions()
+        if not questions:
+            raise SystemExit(f"no recordings in {replay_path}")
+        db_path = str(Path(tmp) / "load.db")
+        run_pipeline(questions[0], db_path, mock_mode=True)  # create the schema up front
+
+        def _one(i: int) -> float:
+            start = time.perf_counter()
+            run_pipeline(questions[i % len(questions)], db_path, use_cache=False)
+            return time.perf_counter() - start
+
+        profiler = cProfile.Profile() if args.profile else None
+        with recorder.installed(model_invoker.PROVIDERS):
+            start = time.perf_counter()
+            if profiler:
+                # cProfile only sees its own thread, so profiled runs are serial.
+                profiler.enable()
+                latencies = [_one(i) for i in range(args.requests)]
+                profiler.disable()
+            else:
+                with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                    latencies = list(pool.map(_one, range(args.requests)))
+            elapsed = time.perf_counter() - start
+        stats = recorder.stats()
+        recorder.close()
+
+    print("| requests | workers | speed | seconds | req/s | p50 s | p95 s | replayed | misses |")
+    print("|---|---|---|---|---|---|---|---|---|")
+    workers = 1 if profiler else args.workers
+    print(
+        f"| {args.requests} | {workers} | {args.speed} | {elapsed:.2f} | {args.requests / elapsed:.1f} | "
+        f"{_percentile(latencies, 0.5):.3f} | {_percentile(latencies, 0.95):.3f} | "
+        f"{stats['replayed']} | {stats['misses']} |"
+    )
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 import argparse
 import json
 from pathlib import Path
+from typing import Dict, Optional, Sequence
 
+from modules.compare_cache import CompareCache
 from modules.database import DatabaseManager
 from modules.decoupler import restructure
 from modules.divergence_detector import compare_answers
 from modules.evidence_retriever import fetch_evidence
 from modules.fusion_generator import generate_fused_answer
 from modules.knowledge_graph import build_graph_from_text, compare_graphs
+from modules import model_invoker
 from modules.model_invoker import get_answers
+from modules.response_recorder import ResponseRecorder
+from modules.write_behind import DURABILITY_LEVELS, WriteBehindDatabase
 
 
 def run_pipeline(
@@ -19,6 +24,12 @@ def run_pipeline(
     enable_evidence: bool = False,
     enable_graph: bool = False,
     allow_mock_fallback: bool = False,
+    similarity_mode: str = "exact",
+    compare_cache: Optional[CompareCache] = None,
+    latency_budget: Optional[float] = None,
+    models: Optional[Sequence[str]] = None,
+    provider_policy: str = "default",
+    db: Optional[DatabaseManager] = None,
 ) -> str:
     question = (question or "").strip()
     if not question:
@@ -26,109 +37,127 @@ def run_pipeline(
     if len(question) > 5000:
         raise ValueError("question is too long; max length is 5000 characters.")
 
-    db = DatabaseManager(db_path)
-    db.init_db()
+    if db is None:
+        # A shared (e.g. persistent=True) manager can be passed in; it is initialised by its owner.
+        db = DatabaseManager(db_path)
+        db.init_db()
 
-    query_id = db.save_query(question)
+    # All rows of this run are committed in one transaction at the end; rows buffered
+    # before a failure (e.g. one provider's paid-for answer) are still kept.
+    with db.unit_of_work(commit_on_error=True) as uow:
+        query_id = uow.save_query(question)
 
-    answers = get_answers(
-        question=question,
-        db=db,
-        query_id=query_id,
-        use_cache=use_cache,
-        mock_mode=mock_mode,
-        allow_mock_fallback=allow_mock_fallback,
-    )
+        served_by: Dict[str, str] = {}
+        answers = get_answers(
+            question=question,
+            db=uow,
+            query_id=query_id,
+            use_cache=use_cache,
+            mock_mode=mock_mode,
+            allow_mock_fallback=allow_mock_fallback,
+            latency_budget=latency_budget,
+            trace=served_by,
+            models=models,
+            policy=provider_policy,
+        )
+
+        # The first two answered models are compared as A and B (GPT and Claude by default).
+        answer_a, answer_b = list(answers.values())[:2]
+
+        if compare_cache is not None:
+            diff_result = compare_cache.compare(answer_a, answer_b, similarity_mode=similarity_mode)
+        else:
+            diff_result = compare_answers(answer_a, answer_b, similarity_mode=similarity_mode)
+        if served_by:
+            diff_result["served_by"] = dict(served_by)
+        if enable_graph:
+            graph_a = build_graph_from_text(answer_a)
+            graph_b = build_graph_from_text(answer_b)
+            graph_cmp = compare_graphs(graph_a, graph_b)
+            diff_result["graph_analysis"] = graph_cmp
+
+            def _sig(item):
+                if not isinstance(item, dict):
+                    return None
+                ctype = str(item.get("type", "")).strip().lower()
+                claim_a = str(item.get("model_a_claim", "")).strip().lower()
+                claim_b = str(item.get("model_b_claim", "")).strip().lower()
+                return (ctype, claim_a, claim_b)
 
-    gpt_answer = answers["GPT"]
-    claude_answer = answers["Claude"]
-
-    diff_result = compare_answers(gpt_answer, claude_answer)
-    if enable_graph:
-        graph_a = build_graph_from_text(gpt_answer)
-        graph_b = build_graph_from_text(claude_answer)
-        graph_cmp = compare_graphs(graph_a, graph_b)
-        diff_result["graph_analysis"] = graph_cmp
-
-        def _sig(item):
-            if not isinstance(item, dict):
-                return None
-            ctype = str(item.get("type", "")).strip().lower()
-            claim_a = str(item.get("model_a_claim", "")).strip().lower()
-            claim_b = str(item.get("model_b_claim", "")).strip().lower()
-            return (ctype, claim_a, claim_b)
-
-        existing_signatures = set()
-        for c in diff_result.get("conflicts", []):
-            sig = _sig(c)
-            if sig:
-                existing_signatures.add(sig)
-
-        for i, pair in enumerate(graph_cmp.get("contradictions", []), start=1):
-            subject = str(pair[0]) if isinstance(pair, tuple) and len(pair) >= 1 else f"graph_{i}"
-            obj = str(pair[1]) if isinstance(pair, tuple) and len(pair) >= 2 else ""
-            graph_conflict = {
-                "conflict_id": f"graph_contradiction_{subject}_{i}",
-                "type": "contradiction",
-                "subject": subject,
-                "model_a_claim": f"{subject}是{obj}" if obj else subject,
-                "model_b_claim": f"{subject}不是{obj}" if obj else subject,
-                "description": "Contradiction detected by graph comparison.",
-            }
-            sig = _sig(graph_conflict)
-            reverse_sig = (
-                sig[0],
-                sig[2],
-                sig[1],
-            ) if sig else None
-            if sig not in existing_signatures and reverse_sig not in existing_signatures:
-                diff_result.setdefault("conflicts", []).append(graph_conflict)
+            existing_signatures = set()
+            for c in diff_result.get("conflicts", []):
+                sig = _sig(c)
                 if sig:
                     existing_signatures.add(sig)
-        if graph_cmp.get("contradictions"):
-            diff_result["summary"] = f"{diff_result.get('summary', '')}，图谱冲突{len(graph_cmp['contradictions'])}项".strip("，")
-    db.save_divergence(
-        query_id=query_id,
-        diff_summary=diff_result["summary"],
-        diff_detail=json.dumps(diff_result, ensure_ascii=False),
-    )
 
-    structured = restructure(
-        answer_a=gpt_answer,
-        answer_b=claude_answer,
-        diff_result=diff_result,
-    )
-    db.save_structure(query_id=query_id, structured_data=json.dumps(structured, ensure_ascii=False))
-
-    evidence = {}
-    if enable_evidence:
-        evidence = fetch_evidence(diff_result.get("conflicts", []))
-        for conflict_id, info in evidence.items():
-            db.save_evidence(
-                query_id=query_id,
-                diff_id=conflict_id,
-                evidence_text=info.get("evidence_text", ""),
-                source=info.get("source", ""),
-                verdict=info.get("verdict", "unknown"),
-                source_tier=info.get("source_tier", ""),
-                auto_applied=1 if info.get("auto_applied", False) else 0,
-                confidence=float(info.get("confidence", 0.0)),
-            )
-
-    final_answer = generate_fused_answer(
-        answer_a=gpt_answer,
-        answer_b=claude_answer,
-        diff_result=diff_result,
-        structured=structured,
-        evidence=evidence,
-    )
+            for i, pair in enumerate(graph_cmp.get("contradictions", []), start=1):
+                subject = str(pair[0]) if isinstance(pair, tuple) and len(pair) >= 1 else f"graph_{i}"
+                obj = str(pair[1]) if isinstance(pair, tuple) and len(pair) >= 2 else ""
+                graph_conflict = {
+                    "conflict_id": f"graph_contradiction_{subject}_{i}",
+                    "type": "contradiction",
+                    "subject": subject,
+                    "model_a_claim": f"{subject}是{obj}" if obj else subject,
+                    "model_b_claim": f"{subject}不是{obj}" if obj else subject,
+                    "description": "Contradiction detected by graph comparison.",
+                }
+                sig = _sig(graph_conflict)
+                reverse_sig = (
+                    sig[0],
+                    sig[2],
+                    sig[1],
+                ) if sig else None
+                if sig not in existing_signatures and reverse_sig not in existing_signatures:
+                    diff_result.setdefault("conflicts", []).append(graph_conflict)
+                    if sig:
+                        existing_signatures.add(sig)
+            if graph_cmp.get("contradictions"):
+                diff_result["summary"] = f"{diff_result.get('summary', '')}，图谱冲突{len(graph_cmp['contradictions'])}项".strip("，")
+        uow.save_divergence(
+            query_id=query_id,
+            diff_summary=diff_result["summary"],
+            diff_detail=json.dumps(diff_result, ensure_ascii=False),
+        )
 
-    db.save_fused_answer(
-        query_id=query_id,
-        answer_text=final_answer,
-        notes=f"mock_mode={mock_mode}, evidence={enable_evidence}, graph={enable_graph}",
-    )
-    return final_answer
+        structured = restructure(
+            answer_a=answer_a,
+            answer_b=answer_b,
+            diff_result=diff_result,
+        )
+        uow.save_structure(query_id=query_id, structured_data=json.dumps(structured, ensure_ascii=False))
+
+        evidence = {}
+        if enable_evidence:
+            evidence = fetch_evidence(diff_result.get("conflicts", []))
+            for conflict_id, info in evidence.items():
+                uow.save_evidence(
+                    query_id=query_id,
+                    diff_id=conflict_id,
+                    evidence_text=info.get("evidence_text", ""),
+                    source=info.get("source", ""),
+                    verdict=info.get("verdict", "unknown"),
+                    source_tier=info.get("source_tier", ""),
+                    auto_applied=1 if info.get("auto_applied", False) else 0,
+                    confidence=float(info.get("confidence", 0.0)),
+                )
+
+        final_answer = generate_fused_answer(
+            answer_a=answer_a,
+            answer_b=answer_b,
+            diff_result=diff_result,
+            structured=structured,
+            evidence=evidence,
+        )
+
+        uow.save_fused_answer(
+            query_id=query_id,
+            answer_text=final_answer,
+            notes=(
+                f"mock_mode={mock_mode}, evidence={enable_evidence}, graph={enable_graph}"
+                + "".join(f", {m}={path}" for m, path in served_by.items())
+            ),
+        )
+        return final_answer
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -148,21 +177,91 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--no-cache", action="store_true", help="Disable cache lookup.")
     parser.add_argument("--enable-evidence", action="store_true", help="Enable evidence retrieval module.")
     parser.add_argument("--enable-graph", action="store_true", help="Enable knowledge-graph contradiction analysis.")
+    parser.add_argument(
+        "--similarity",
+        choices=["exact", "approx", "off"],
+        default="exact",
+        help="Whole-answer similarity_ratio: exact difflib ratio, linear-time upper bound, or skipped.",
+    )
+    parser.add_argument(
+        "--latency-budget",
+        type=float,
+        default=None,
+        help="Seconds allowed for model answers; slow providers are hedged, then served from cache or mock.",
+    )
+    parser.add_argument(
+        "--models",
+        default=None,
+        help="Comma-separated registered models to compare, e.g. GPT,Local (default: chosen by --provider-policy).",
+    )
+    parser.add_argument(
+        "--provider-policy",
+        choices=["default", "fastest", "cheapest"],
+        default="default",
+        help="How to pick the model pair when --models is not given.",
+    )
+    parser.add_argument("--record", metavar="PATH", help="Record live provider answers and latencies to PATH.")
+    parser.add_argument("--replay", metavar="PATH", help="Serve provider answers from a recording; no network.")
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay latency multiplier (0 = instant, 0.5 = half the recorded latency).",
+    )
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help="Queue database writes for a background writer instead of committing on the request path.",
+    )
+    parser.add_argument(
+        "--durability",
+        choices=list(DURABILITY_LEVELS),
+        default="buffered",
+        help="With --write-behind: return once queued, once committed, or once committed with a full sync.",
+    )
     return parser
 
 
 def main():
     parser = build_arg_parser()
     args = parser.parse_args()
-    result = run_pipeline(
-        question=args.question,
-        db_path=args.db_path,
-        mock_mode=args.mock,
-        use_cache=not args.no_cache,
-        enable_evidence=args.enable_evidence,
-        enable_graph=args.enable_graph,
-        allow_mock_fallback=args.allow_mock_fallback,
-    )
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive.")
+    recorder = None
+    if args.record or args.replay:
+        model_invoker.load_dotenv()
+        model_invoker.register_env_providers()
+        recorder = ResponseRecorder(
+            args.record or args.replay,
+            mode="record" if args.record else "replay",
+            latency_scale=args.replay_speed,
+        )
+        recorder.install(model_invoker.PROVIDERS)
+    db = None
+    if args.write_behind:
+        db = WriteBehindDatabase(DatabaseManager(args.db_path), durability=args.durability)
+        db.init_db()
+    try:
+        result = run_pipeline(
+            question=args.question,
+            db_path=args.db_path,
+            mock_mode=args.mock,
+            use_cache=not args.no_cache,
+            enable_evidence=args.enable_evidence,
+            enable_graph=args.enable_graph,
+            allow_mock_fallback=args.allow_mock_fallback,
+            similarity_mode=args.similarity,
+            latency_budget=args.latency_budget,
+            models=[m.strip() for m in args.models.split(",") if m.strip()] if args.models else None,
+            provider_policy=args.provider_policy,
+            db=db,
+        )
+    finally:
+        if db is not None:
+            db.close()  # flushes queued writes
+        if recorder is not None:
+            recorder.uninstall(model_invoker.PROVIDERS)
+            recorder.close()
     print(result)
 
 
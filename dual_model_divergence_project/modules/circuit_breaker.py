@@ -0,0 +1,163 @@
+import threading
+import time
+from typing import Any, Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(RuntimeError):
+    """Raised when a call is refused because the provider's circuit is open."""
+
+    provider_fault = False
+
+
+def _is_provider_fault(error: BaseException) -> bool:
+    # Local refusals (admission queue full, deadline unreachable, ...) set
+    # provider_fault = False: the provider was never asked, so it is not blamed.
+    return getattr(error, "provider_fault", True)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one provider.
+
+    - closed: calls pass; failure_threshold consecutive failures open the circuit.
+    - open: calls are refused until recovery_timeout seconds have passed.
+    - half_open: up to half_open_max_calls probes pass; success_threshold successes
+      close the circuit, any failure re-opens it.
+    Errors with provider_fault = False (raised before the provider was reached) free
+    the call slot without counting as a failure or a success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        success_threshold: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1 or half_open_max_calls < 1 or success_threshold < 1:
+            raise ValueError("breaker thresholds must be >= 1.")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._successes = 0
+        self._probes = 0
+        self._opened_at = 0.0
+        self._transitions: Dict[str, int] = {}
+        self._stats = {"allowed": 0, "rejected": 0, "successes": 0, "failures": 0, "released": 0}
+
+    def _move(self, state: str):
+        key = f"{self._state}->{state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        self._state = state
+        self._failures = self._successes = self._probes = 0
+        if state == OPEN:
+            self._opened_at = self._clock()
+
+    def _current(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._move(HALF_OPEN)
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current()
+
+    def allow(self) -> bool:
+        """Reserve a call slot; every allowed call must be followed by record_success/failure."""
+        with self._lock:
+            state = self._current()
+            if state == CLOSED or (state == HALF_OPEN and self._probes < self.half_open_max_calls):
+                if state == HALF_OPEN:
+                    self._probes += 1
+                self._stats["allowed"] += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            if self._state == HALF_OPEN:
+                self._successes += 1
+                self._probes = max(0, self._probes - 1)
+                if self._successes >= self.success_threshold:
+                    self._move(CLOSED)
+            else:
+                self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+            if self._state == HALF_OPEN:
+                self._move(OPEN)
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._move(OPEN)
+
+    def release(self):
+        """Give back an allowed call's slot without recording an outcome."""
+        with self._lock:
+            self._stats["released"] += 1
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        if not self.allow():
+            raise CircuitOpen(f"{self.name}: circuit is open.")
+        try:
+            result = fn()
+        except Exception as e:
+            if _is_provider_fault(e):
+                self.record_failure()
+            else:
+                self.release()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["state"] = self._current()
+            out["consecutive_failures"] = self._failures
+            out["transitions"] = dict(self._transitions)
+        return out
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(provider)
+        if breaker is None:
+            breaker = _BREAKERS[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+def configure_breaker(provider: str, **options: Any) -> CircuitBreaker:
+    """Replace the provider's breaker, e.g. configure_breaker("openai", failure_threshold=3)."""
+    breaker = CircuitBreaker(provider, **options)
+    with _BREAKERS_LOCK:
+        _BREAKERS[provider] = breaker
+    return breaker
+
+
+def get_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _BREAKERS_LOCK:
+        breakers = dict(_BREAKERS)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from . import divergence_detector
+from .divergence_detector import compare_answers
+
+
+def _config_fingerprint() -> str:
+    """Hash of the detector version and every tunable that can change compare_answers output."""
+    payload = {
+        "version": divergence_detector.DETECTOR_VERSION,
+        "config": divergence_detector._detector_config(),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def compare_cache_key(answer_a: str, answer_b: str, **options) -> str:
+    h = hashlib.sha256()
+    h.update(_config_fingerprint().encode("ascii"))
+    h.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    for text in (answer_a, answer_b):
+        data = text.encode("utf-8")
+        # Length prefix keeps ("ab", "c") and ("a", "bc") apart.
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class CompareCache:
+    """Bounded LRU memo for compare_answers, with an optional SQLite tier that survives restarts.
+
+    Keys cover both answers, the compare options, DETECTOR_VERSION and the live detector
+    config, so changing thresholds or NEGATION_PATTERNS never serves a stale result.
+    Results are stored as JSON and decoded on every hit, so callers may mutate them.
+    The disk tier keeps at most max_disk_entries rows (oldest written are pruned on
+    insert) and, with disk_ttl seconds set, ignores and prunes older rows.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 100_000,
+        disk_ttl: Optional[float] = None,
+    ):
+        if max_entries < 0:
+            raise ValueError("max_entries must be >= 0.")
+        if max_disk_entries < 1:
+            raise ValueError("max_disk_entries must be >= 1.")
+        if disk_ttl is not None and disk_ttl <= 0:
+            raise ValueError("disk_ttl must be > 0.")
+        self.max_entries = max_entries
+        self.disk_path = Path(disk_path) if disk_path else None
+        self.max_disk_entries = max_disk_entries
+        self.disk_ttl = disk_ttl
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if self.disk_path:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS compare_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        result_json TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_compare_cache_created ON compare_cache(created_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.disk_path))
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _ttl_modifier(self) -> str:
+        return f"-{self.disk_ttl} seconds"
+
+    def _store(self, key: str, encoded: str):
+        with self._connect() as conn:
+            # REPLACE re-inserts, so rowid order is write order.
+            conn.execute(
+                "INSERT OR REPLACE INTO compare_cache(cache_key, result_json) VALUES (?, ?)",
+                (key, encoded),
+            )
+            pruned = conn.execute(
+                "DELETE FROM compare_cache WHERE rowid <= (SELECT MAX(rowid) FROM compare_cache) - ?",
+                (self.max_disk_entries,),
+            ).rowcount
+            if self.disk_ttl is not None:
+                pruned += conn.execute(
+                    "DELETE FROM compare_cache WHERE created_at < datetime('now', ?)",
+                    (self._ttl_modifier(),),
+                ).rowcount
+        if pruned:
+            with self._lock:
+                self._stats["disk_evictions"] += pruned
+
+    def _remember(self, key: str, encoded: str):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = encoded
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return encoded
+        if self.disk_path:
+            with self._connect() as conn:
+                if self.disk_ttl is None:
+                    row = conn.execute(
+                        "SELECT result_json FROM compare_cache WHERE cache_key = ?",
+                        (key,),
+                    ).fetchone()
+                else:
+                    row = conn.execute(
+                        "SELECT result_json FROM compare_cache WHERE cache_key = ? AND created_at >= datetime('now', ?)",
+                        (key, self._ttl_modifier()),
+                    ).fetchone()
+            if row:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                self._remember(key, row[0])
+                return row[0]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def compare(
+        self,
+        answer_a: str,
+        answer_b: str,
+        engine: str = "python",
+        similarity_mode: str = "exact",
+        hierarchical: Optional[bool] = None,
+    ) -> Dict:
+        options = {"engine": engine, "similarity_mode": similarity_mode, "hierarchical": hierarchical}
+        key = compare_cache_key(answer_a, answer_b, **options)
+        encoded = self._lookup(key)
+        if encoded is None:
+            result = compare_answers(answer_a, answer_b, **options)
+            encoded = json.dumps(result, ensure_ascii=False)
+            self._remember(key, encoded)
+            if self.disk_path:
+                self._store(key, encoded)
+        return json.loads(encoded)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._entries)
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM compare_cache")
@@ -1,25 +1,229 @@
+import hashlib
+import itertools
+import json
 import sqlite3
+import threading
+import unicodedata
+import weakref
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+
+def question_hash(question_text: str) -> str:
+    """Cache key for a question: sha256 of its NFC-normalized, stripped text."""
+    normalized = unicodedata.normalize("NFC", question_text or "").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+# question_hash and mode are denormalized onto model_responses so cache lookups are a
+# single probe of idx_model_responses_cache.  mode is the X of usage_info "mode=X".
+_MODE_OF_USAGE = "CASE WHEN {0} LIKE 'mode=%' THEN substr({0}, 6) END"
+_INSERTS = {
+    "model_responses": f"""
+        INSERT INTO model_responses(query_id, model_name, response_text, usage_info, question_hash, mode)
+        VALUES (
+            ?1, ?2, ?3, ?4,
+            (SELECT q.question_hash FROM runs r JOIN questions q ON q.id = r.question_id WHERE r.id = ?1),
+            {_MODE_OF_USAGE.format("?4")}
+        )
+    """,
+    "divergences": """
+        INSERT INTO divergences(query_id, diff_summary, diff_detail)
+        VALUES (?, ?, ?)
+    """,
+    "structures": """
+        INSERT INTO structures(query_id, structured_data)
+        VALUES (?, ?)
+    """,
+    "fused_answers": """
+        INSERT INTO fused_answers(query_id, answer_text, notes)
+        VALUES (?, ?, ?)
+    """,
+    "evidence": """
+        INSERT INTO evidence(
+            query_id, diff_id, evidence_text, source, verdict, source_tier, auto_applied, confidence
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+}
+
+
+_QUESTIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_hash TEXT NOT NULL UNIQUE,
+        question_text TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def _insert_run(conn: sqlite3.Connection, question_text: str) -> int:
+    """Intern the question text and add a runs row for it; returns the run (query) id."""
+    digest = question_hash(question_text)
+    conn.execute(
+        "INSERT INTO questions(question_hash, question_text) VALUES (?, ?) ON CONFLICT(question_hash) DO NOTHING",
+        (digest, question_text),
+    )
+    cur = conn.execute("INSERT INTO runs(question_id) SELECT id FROM questions WHERE question_hash = ?", (digest,))
+    return int(cur.lastrowid)
+
+
+def _mode_of(usage_info: str) -> Optional[str]:
+    """Python twin of _MODE_OF_USAGE."""
+    return usage_info[len("mode="):] if (usage_info or "").startswith("mode=") else None
+
+
+_PendingKey = Tuple[str, str]  # (database file, question_hash)
+_PendingToken = Tuple[_PendingKey, Tuple[str, Optional[str]], int]
+
+
+class _PendingAnswers:
+    """Answers buffered by open units of work, visible to cache reads until committed.
+
+    Shared by every DatabaseManager in the process (keyed by database file), so a
+    second request for a question does not call the providers again while the first
+    run is still between get_answers() and its unit-of-work commit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._entries: Dict[_PendingKey, Dict[Tuple[str, Optional[str]], Tuple[int, str]]] = {}
+
+    def add(self, path: str, question_text: str, model_name: str, mode: Optional[str], text: str) -> _PendingToken:
+        key = (path, question_hash(question_text))
+        slot = (model_name, mode)
+        with self._lock:
+            seq = next(self._seq)
+            self._entries.setdefault(key, {})[slot] = (seq, text)
+        return key, slot, seq
+
+    def discard(self, tokens: Sequence[_PendingToken]):
+        with self._lock:
+            for key, slot, seq in tokens:
+                answers = self._entries.get(key)
+                if answers is None or answers.get(slot, (None,))[0] != seq:
+                    continue  # superseded by a newer buffered answer
+                del answers[slot]
+                if not answers:
+                    del self._entries[key]
+
+    def lookup(self, path: str, digest: str, model_names: Sequence[str], mode: Optional[str]) -> Dict[str, str]:
+        with self._lock:
+            answers = self._entries.get((path, digest))
+            if not answers:
+                return {}
+            found: Dict[str, Tuple[int, str]] = {}
+            for (model_name, answer_mode), hit in answers.items():
+                if model_name in model_names and (not mode or answer_mode == mode):
+                    if model_name not in found or hit[0] > found[model_name][0]:
+                        found[model_name] = hit
+        return {m: text for m, (_, text) in found.items()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(answers) for answers in self._entries.values())
+
+
+_PENDING = _PendingAnswers()
+
+
+class _Reader:
+    """Thread-local reader connection; closed when its thread (and the handle) goes away."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __del__(self):
+        self.conn.close()
 
 
 class DatabaseManager:
-    def __init__(self, db_path: str):
+    """SQLite store for queries, answers and pipeline artefacts.
+
+    By default every call opens, configures and closes its own connection.  With
+    persistent=True the manager keeps one writer connection (writes are serialized
+    by a lock) plus one reader connection per thread, each configured once; call
+    close() (or use the manager as a context manager) to release them.
+    """
+
+    def __init__(self, db_path: str, persistent: bool = False):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.persistent = persistent
+        self._write_lock = threading.RLock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._readers: "weakref.WeakSet[_Reader]" = weakref.WeakSet()
+        self._readers_lock = threading.Lock()
+        self._pending_path = str(self.db_path.resolve())
 
-    @contextmanager
-    def _connect(self):
-        conn = sqlite3.connect(str(self.db_path))
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=not self.persistent)
         conn.execute("PRAGMA foreign_keys = ON")
         conn.execute("PRAGMA journal_mode = WAL")
         conn.execute("PRAGMA busy_timeout = 5000")
-        try:
-            yield conn
-            conn.commit()
-        finally:
-            conn.close()
+        return conn
+
+    @contextmanager
+    def _connect(self):
+        if not self.persistent:
+            conn = self._open()
+            try:
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+            return
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def _read(self):
+        """Connection for SELECTs; a per-thread reader in persistent mode."""
+        if not self.persistent:
+            with self._connect() as conn:
+                yield conn
+            return
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = self._local.reader = _Reader(self._open())
+            with self._readers_lock:
+                self._readers.add(reader)
+        yield reader.conn
+
+    def close(self):
+        """Close the persistent connections; the manager reopens them if used again."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            readers = list(self._readers)
+            self._readers = weakref.WeakSet()
+        for reader in readers:
+            reader.conn.close()
+        # A fresh thread-local makes every thread open a new reader on next use.
+        self._local = threading.local()
+
+    def __enter__(self) -> "DatabaseManager":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     @staticmethod
     def _has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
@@ -29,14 +233,21 @@ class DatabaseManager:
 
     def init_db(self):
         with self._connect() as conn:
+            self._migrate_queries_to_runs(conn)
             conn.executescript(
-                """
-                CREATE TABLE IF NOT EXISTS queries (
+                _QUESTIONS_DDL
+                + """;
+                CREATE TABLE IF NOT EXISTS runs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    question_text TEXT NOT NULL,
+                    question_id INTEGER NOT NULL REFERENCES questions(id),
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
 
+                -- Read-only view with the pre-interning queries layout.
+                CREATE VIEW IF NOT EXISTS queries AS
+                    SELECT r.id, q.question_text, q.question_hash, r.created_at
+                    FROM runs r JOIN questions q ON q.id = r.question_id;
+
                 CREATE TABLE IF NOT EXISTS model_responses (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     query_id INTEGER NOT NULL,
@@ -44,7 +255,9 @@ class DatabaseManager:
                     response_text TEXT NOT NULL,
                     usage_info TEXT,
                     response_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(query_id) REFERENCES queries(id) ON DELETE CASCADE
+                    question_hash TEXT,
+                    mode TEXT,
+                    FOREIGN KEY(query_id) REFERENCES runs(id) ON DELETE CASCADE
                 );
                 CREATE INDEX IF NOT EXISTS idx_model_responses_query_model
                     ON model_responses(query_id, model_name);
@@ -55,7 +268,7 @@ class DatabaseManager:
                     diff_summary TEXT NOT NULL,
                     diff_detail TEXT NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(query_id) REFERENCES queries(id) ON DELETE CASCADE
+                    FOREIGN KEY(query_id) REFERENCES runs(id) ON DELETE CASCADE
                 );
 
                 CREATE TABLE IF NOT EXISTS structures (
@@ -63,7 +276,7 @@ class DatabaseManager:
                     query_id INTEGER NOT NULL,
                     structured_data TEXT NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(query_id) REFERENCES queries(id) ON DELETE CASCADE
+                    FOREIGN KEY(query_id) REFERENCES runs(id) ON DELETE CASCADE
                 );
 
                 CREATE TABLE IF NOT EXISTS fused_answers (
@@ -72,7 +285,7 @@ class DatabaseManager:
                     answer_text TEXT NOT NULL,
                     notes TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(query_id) REFERENCES queries(id) ON DELETE CASCADE
+                    FOREIGN KEY(query_id) REFERENCES runs(id) ON DELETE CASCADE
                 );
 
                 CREATE TABLE IF NOT EXISTS evidence (
@@ -86,7 +299,7 @@ class DatabaseManager:
                     auto_applied INTEGER DEFAULT 0,
                     confidence REAL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(query_id) REFERENCES queries(id) ON DELETE CASCADE
+                    FOREIGN KEY(query_id) REFERENCES runs(id) ON DELETE CASCADE
                 );
                 """
             )
@@ -97,14 +310,70 @@ class DatabaseManager:
                 conn.execute("ALTER TABLE evidence ADD COLUMN auto_applied INTEGER DEFAULT 0")
             if not self._has_column(conn, "evidence", "confidence"):
                 conn.execute("ALTER TABLE evidence ADD COLUMN confidence REAL")
+            if not self._has_column(conn, "model_responses", "question_hash"):
+                conn.execute("ALTER TABLE model_responses ADD COLUMN question_hash TEXT")
+                conn.execute("ALTER TABLE model_responses ADD COLUMN mode TEXT")
+                conn.execute(
+                    f"""
+                    UPDATE model_responses
+                    SET question_hash = (
+                            SELECT q.question_hash FROM runs r JOIN questions q ON q.id = r.question_id
+                            WHERE r.id = model_responses.query_id
+                        ),
+                        mode = {_MODE_OF_USAGE.format("usage_info")}
+                    """
+                )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_model_responses_cache
+                    ON model_responses(question_hash, model_name, mode, id DESC)
+                """
+            )
+
+    @staticmethod
+    def _migrate_queries_to_runs(conn: sqlite3.Connection):
+        """Split a pre-interning queries table into questions + runs, keeping run ids.
+
+        Duplicate question texts collapse into one questions row; every queries row
+        becomes a runs row with the same id, so child foreign keys stay valid (the
+        rename rewrites their REFERENCES clauses).  Needs SQLite >= 3.35 (DROP COLUMN).
+        """
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queries'").fetchone()
+        if row is None:
+            return
+        conn.commit()
+        conn.execute("BEGIN")
+        try:
+            conn.execute(_QUESTIONS_DDL)
+            conn.create_function("question_hash", 1, question_hash, deterministic=True)
+            hash_expr = (
+                "queries.question_hash"
+                if DatabaseManager._has_column(conn, "queries", "question_hash")
+                else "question_hash(queries.question_text)"
+            )
+            conn.execute(
+                f"""
+                INSERT INTO questions(question_hash, question_text)
+                SELECT {hash_expr}, question_text FROM queries ORDER BY id
+                ON CONFLICT(question_hash) DO NOTHING
+                """
+            )
+            conn.execute("ALTER TABLE queries ADD COLUMN question_id INTEGER REFERENCES questions(id)")
+            conn.execute(
+                f"UPDATE queries SET question_id = (SELECT id FROM questions WHERE question_hash = {hash_expr})"
+            )
+            conn.execute("ALTER TABLE queries DROP COLUMN question_text")
+            if DatabaseManager._has_column(conn, "queries", "question_hash"):
+                conn.execute("ALTER TABLE queries DROP COLUMN question_hash")
+            conn.execute("ALTER TABLE queries RENAME TO runs")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
 
     def save_query(self, question_text: str) -> int:
         with self._connect() as conn:
-            cur = conn.execute(
-                "INSERT INTO queries(question_text) VALUES(?)",
-                (question_text,),
-            )
-            return int(cur.lastrowid)
+            return _insert_run(conn, question_text)
 
     def get_cached_response(
         self,
@@ -112,74 +381,110 @@ class DatabaseManager:
         model_name: str,
         response_mode: Optional[str] = None,
     ) -> Optional[str]:
-        with self._connect() as conn:
-            if response_mode:
-                row = conn.execute(
-                    """
-                    SELECT mr.response_text
-                    FROM model_responses mr
-                    JOIN queries q ON q.id = mr.query_id
-                    WHERE q.question_text = ?
-                      AND mr.model_name = ?
-                      AND mr.usage_info = ?
-                    ORDER BY mr.id DESC
-                    LIMIT 1
-                    """,
-                    (question_text, model_name, f"mode={response_mode}"),
-                ).fetchone()
-            else:
-                row = conn.execute(
-                    """
-                    SELECT mr.response_text
-                    FROM model_responses mr
-                    JOIN queries q ON q.id = mr.query_id
-                    WHERE q.question_text = ? AND mr.model_name = ?
-                    ORDER BY mr.id DESC
+        return self.get_cached_answers(question_text, [model_name], response_mode).get(model_name)
+
+    def get_cached_answers(
+        self,
+        question_text: str,
+        model_names: Sequence[str],
+        response_mode: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """Latest cached answer per model for one question, resolved in one indexed query.
+
+        response_mode matches usage_info "mode=<response_mode>" exactly; None matches any.
+        Answers buffered by open units of work on this database are returned first.
+        """
+        digest = question_hash(question_text)
+        found = _PENDING.lookup(self._pending_path, digest, model_names, response_mode)
+        missing = [m for m in model_names if m not in found]
+        if not missing:
+            return {m: found[m] for m in model_names}
+        # A literal mode filter keeps the subquery a pure seek on idx_model_responses_cache.
+        mode_filter = "AND mode = ?3" if response_mode else "AND ?3 IS NULL"
+        with self._read() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT mr.model_name, mr.response_text
+                FROM json_each(?2) m
+                JOIN model_responses mr ON mr.id = (
+                    SELECT id FROM model_responses
+                    WHERE question_hash = ?1 AND model_name = m.value {mode_filter}
+                    ORDER BY id DESC
                     LIMIT 1
-                    """,
-                    (question_text, model_name),
-                ).fetchone()
-            return row[0] if row else None
+                )
+                """,
+                (digest, json.dumps(missing, ensure_ascii=False), response_mode or None),
+            ).fetchall()
+        found.update(rows)
+        return {m: found[m] for m in model_names if m in found}
 
-    def save_response(self, query_id: int, model_name: str, response_text: str, usage_info: str = ""):
-        with self._connect() as conn:
-            conn.execute(
+    def get_cached_responses(
+        self,
+        questions: Sequence[str],
+        model_names: Sequence[str],
+        response_mode: str,
+    ) -> Dict[Tuple[str, str], str]:
+        """Latest cached answer per (question, model) for many questions in one query."""
+        if not questions or not model_names:
+            return {}
+        by_hash: Dict[str, List[str]] = {}
+        for question in questions:
+            by_hash.setdefault(question_hash(question), []).append(question)
+        with self._read() as conn:
+            rows = conn.execute(
                 """
-                INSERT INTO model_responses(query_id, model_name, response_text, usage_info)
-                VALUES (?, ?, ?, ?)
+                SELECT mr.question_hash, mr.model_name, mr.response_text
+                FROM model_responses mr
+                WHERE mr.question_hash IN (SELECT value FROM json_each(?))
+                  AND mr.model_name IN (SELECT value FROM json_each(?))
+                  AND mr.mode = ?
+                ORDER BY mr.id
                 """,
-                (query_id, model_name, response_text, usage_info),
-            )
+                (json.dumps(list(by_hash)), json.dumps(list(model_names), ensure_ascii=False), response_mode),
+            ).fetchall()
+        # Rows come oldest first, so later answers overwrite earlier ones.
+        out: Dict[Tuple[str, str], str] = {}
+        for digest, model_name, text in rows:
+            for question in by_hash[digest]:
+                out[(question, model_name)] = text
+        if len(_PENDING):
+            for digest, same in by_hash.items():
+                for model_name, text in _PENDING.lookup(self._pending_path, digest, model_names, response_mode).items():
+                    for question in same:
+                        out[(question, model_name)] = text
+        return out
+
+    def save_responses_bulk(self, runs: Sequence[Tuple[str, Sequence[Tuple[str, str, str]]]]) -> List[int]:
+        """Store (question, [(model_name, response_text, usage_info), ...]) runs in one transaction.
+
+        Each run gets its own queries row; returns the new query ids in order.
+        """
+        query_ids = []
+        with self._connect() as conn:
+            for question_text, responses in runs:
+                query_id = _insert_run(conn, question_text)
+                conn.executemany(
+                    _INSERTS["model_responses"],
+                    [(query_id, model_name, text, usage_info) for model_name, text, usage_info in responses],
+                )
+                query_ids.append(query_id)
+        return query_ids
+
+    def save_response(self, query_id: int, model_name: str, response_text: str, usage_info: str = ""):
+        with self._connect() as conn:
+            conn.execute(_INSERTS["model_responses"], (query_id, model_name, response_text, usage_info))
 
     def save_divergence(self, query_id: int, diff_summary: str, diff_detail: str):
         with self._connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO divergences(query_id, diff_summary, diff_detail)
-                VALUES (?, ?, ?)
-                """,
-                (query_id, diff_summary, diff_detail),
-            )
+            conn.execute(_INSERTS["divergences"], (query_id, diff_summary, diff_detail))
 
     def save_structure(self, query_id: int, structured_data: str):
         with self._connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO structures(query_id, structured_data)
-                VALUES (?, ?)
-                """,
-                (query_id, structured_data),
-            )
+            conn.execute(_INSERTS["structures"], (query_id, structured_data))
 
     def save_fused_answer(self, query_id: int, answer_text: str, notes: str = ""):
         with self._connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO fused_answers(query_id, answer_text, notes)
-                VALUES (?, ?, ?)
-                """,
-                (query_id, answer_text, notes),
-            )
+            conn.execute(_INSERTS["fused_answers"], (query_id, answer_text, notes))
 
     def save_evidence(
         self,
@@ -194,11 +499,142 @@ class DatabaseManager:
     ):
         with self._connect() as conn:
             conn.execute(
-                """
-                INSERT INTO evidence(
-                    query_id, diff_id, evidence_text, source, verdict, source_tier, auto_applied, confidence
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
+                _INSERTS["evidence"],
                 (query_id, diff_id, evidence_text, source, verdict, source_tier, auto_applied, confidence),
             )
+
+    @contextmanager
+    def unit_of_work(self, commit_on_error: bool = False):
+        """Buffer writes and store them in one transaction when the block exits.
+
+        With commit_on_error the rows buffered so far are still stored when the block
+        raises (e.g. keep a paid-for answer when the other provider failed).
+        """
+        uow = UnitOfWork(self)
+        try:
+            yield uow
+        except BaseException:
+            if commit_on_error:
+                uow.commit()
+            raise
+        else:
+            uow.commit()
+        finally:
+            uow.release()
+
+
+class UnitOfWork:
+    """Write buffer with the DatabaseManager save_* interface, committed as one transaction.
+
+    save_query() returns a provisional negative id; rows that reference it are
+    rewritten to the real runs.id on commit(), so foreign keys stay valid.
+    Buffered answers are published to cache reads (_PendingAnswers) as soon as
+    save_response() is called and withdrawn once they are committed or dropped.
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self.query_ids: Dict[int, int] = {}
+        self._queries: List[Tuple[int, str]] = []
+        self._rows: Dict[str, List[tuple]] = {table: [] for table in _INSERTS}
+        self._pending: List[_PendingToken] = []
+
+    def save_query(self, question_text: str) -> int:
+        provisional = -(len(self.query_ids) + len(self._queries) + 1)
+        self._queries.append((provisional, question_text))
+        return provisional
+
+    def save_response(self, query_id: int, model_name: str, response_text: str, usage_info: str = ""):
+        self._rows["model_responses"].append((query_id, model_name, response_text, usage_info))
+        question_text = dict(self._queries).get(query_id)
+        if question_text is None:
+            with self.db._read() as conn:
+                row = conn.execute("SELECT question_text FROM queries WHERE id = ?", (query_id,)).fetchone()
+            question_text = row[0] if row else None
+        if question_text is not None:
+            self._pending.append(
+                _PENDING.add(self.db._pending_path, question_text, model_name, _mode_of(usage_info), response_text)
+            )
+
+    def save_divergence(self, query_id: int, diff_summary: str, diff_detail: str):
+        self._rows["divergences"].append((query_id, diff_summary, diff_detail))
+
+    def save_structure(self, query_id: int, structured_data: str):
+        self._rows["structures"].append((query_id, structured_data))
+
+    def save_fused_answer(self, query_id: int, answer_text: str, notes: str = ""):
+        self._rows["fused_answers"].append((query_id, answer_text, notes))
+
+    def save_evidence(
+        self,
+        query_id: int,
+        diff_id: str,
+        evidence_text: str,
+        source: str,
+        verdict: str,
+        source_tier: str = "",
+        auto_applied: int = 0,
+        confidence: float = 0.0,
+    ):
+        self._rows["evidence"].append(
+            (query_id, diff_id, evidence_text, source, verdict, source_tier, auto_applied, confidence)
+        )
+
+    def get_cached_response(self, *args, **kwargs) -> Optional[str]:
+        return self.db.get_cached_response(*args, **kwargs)
+
+    def get_cached_answers(self, *args, **kwargs) -> Dict[str, str]:
+        return self.db.get_cached_answers(*args, **kwargs)
+
+    def get_cached_responses(self, *args, **kwargs) -> Dict[Tuple[str, str], str]:
+        return self.db.get_cached_responses(*args, **kwargs)
+
+    def resolve(self, query_id: int) -> int:
+        """Real queries.id for an id returned by save_query() (after commit)."""
+        return self.query_ids.get(query_id, query_id)
+
+    def detach(self) -> "UnitOfWork":
+        """Move the buffered rows into a new unit, e.g. to hand them to a writer thread."""
+        unit = UnitOfWork(self.db)
+        unit._queries, unit._rows, unit._pending = self._queries, self._rows, self._pending
+        self._queries = []
+        self._rows = {table: [] for table in _INSERTS}
+        self._pending = []
+        return unit
+
+    def pending_responses(self) -> List[Tuple[Optional[str], int, str, str, str]]:
+        """Buffered (question_text, query_id, model_name, response_text, usage_info) rows.
+
+        question_text is None when query_id is a real id rather than one from save_query().
+        """
+        texts = dict(self._queries)
+        return [(texts.get(row[0]),) + tuple(row) for row in self._rows["model_responses"]]
+
+    def is_empty(self) -> bool:
+        return not self._queries and not any(self._rows.values())
+
+    def write(self, conn: sqlite3.Connection) -> Dict[int, int]:
+        """Insert the buffered rows on conn (no commit); returns provisional -> real query ids."""
+        query_ids = dict(self.query_ids)
+        for provisional, question_text in self._queries:
+            query_ids[provisional] = _insert_run(conn, question_text)
+        for table, rows in self._rows.items():
+            if rows:
+                conn.executemany(_INSERTS[table], [(query_ids.get(r[0], r[0]),) + r[1:] for r in rows])
+        return query_ids
+
+    def release(self):
+        """Withdraw this unit's answers from the pending overlay (after commit or when dropped)."""
+        _PENDING.discard(self._pending)
+        self._pending = []
+
+    def commit(self):
+        if self.is_empty():
+            return
+        with self.db._connect() as conn:
+            query_ids = self.write(conn)
+        # Only forget the buffer once the transaction has committed.
+        self.query_ids = query_ids
+        self._queries = []
+        self._rows = {table: [] for table in _INSERTS}
+        self.release()
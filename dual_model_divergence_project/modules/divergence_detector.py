@@ -1,12 +1,53 @@
+import bisect
 import difflib
+import functools
+import itertools
+import math
 import re
-from typing import Dict, List, Set, Tuple
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+)
 
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - optional dependency fallback
+    np = None
+
+
+# Bump when a change alters compare_answers output for the same inputs and config.
+DETECTOR_VERSION = "3"
 
 MATCH_W1 = 0.7  # semantic similarity
 MATCH_W2 = 0.2  # rule similarity
 MATCH_W3 = 0.1  # relative position
 MATCH_THRESHOLD = 0.72
+NEGATION_CORE_THRESHOLD = 0.82  # core similarity for opposite-polarity statements
+# Slack for float rounding when pruning pairs by an upper bound on match_score.
+_BOUND_EPS = 1e-9
+
+# "python" scores candidate pairs one by one; "numpy" scores the whole pair matrix at once.
+MATCH_ENGINES = ("python", "numpy")
+# How compare_answers fills similarity_ratio; see _document_similarity().
+SIMILARITY_MODES = ("exact", "approx", "off")
+
+# Hierarchical matching kicks in when either answer has at least this many sentences.
+HIERARCHICAL_MIN_SENTENCES = 150
+HIERARCHICAL_BLOCK_SIZE = 12  # max sentences per block; longer paragraphs are chunked
+HIERARCHICAL_WINDOW = 1  # neighbouring B blocks also searched around each aligned pair
 
 NEGATION_PATTERNS = [
     r"\bnot\b",
@@ -53,6 +94,54 @@ def _char_ngrams(text: str, n: int = 2) -> Set[str]:
     return {t[i : i + n] for i in range(len(t) - n + 1)}
 
 
+_RATIO_STATS: Counter = Counter()
+
+
+def get_ratio_stats() -> Dict[str, int]:
+    """Counters of _bounded_ratio() decisions: which tier rejected a pair, or exact passes."""
+    return {
+        key: int(_RATIO_STATS[key])
+        for key in ("calls", "length_reject", "quick_reject", "exact_reject", "exact_pass")
+    }
+
+
+def reset_ratio_stats():
+    _RATIO_STATS.clear()
+
+
+def _bounded_ratio(a: str, b: str, cutoff: float) -> Optional[float]:
+    """Return SequenceMatcher(a, b).ratio() if it can reach cutoff, else None.
+
+    Cheap upper bounds are tried first: the length bound 2 * min(la, lb) / (la + lb)
+    (the formula behind real_quick_ratio, computed without building a matcher), then
+    quick_ratio().  The exact ratio is only computed when both bounds pass.
+    """
+    _RATIO_STATS["calls"] += 1
+    total = len(a) + len(b)
+    length_bound = 2.0 * min(len(a), len(b)) / total if total else 1.0
+    if length_bound < cutoff:
+        _RATIO_STATS["length_reject"] += 1
+        return None
+    matcher = difflib.SequenceMatcher(a=a, b=b)
+    if matcher.quick_ratio() < cutoff:
+        _RATIO_STATS["quick_reject"] += 1
+        return None
+    ratio = matcher.ratio()
+    if ratio < cutoff:
+        _RATIO_STATS["exact_reject"] += 1
+        return None
+    _RATIO_STATS["exact_pass"] += 1
+    return ratio
+
+
+def _char_ngram_counts(normalized: str, n: int = 2) -> Counter:
+    if not normalized:
+        return Counter()
+    if len(normalized) <= n:
+        return Counter({normalized: 1})
+    return Counter(normalized[i : i + n] for i in range(len(normalized) - n + 1))
+
+
 def _jaccard(a: Set[str], b: Set[str]) -> float:
     if not a and not b:
         return 1.0
@@ -62,19 +151,11 @@ def _jaccard(a: Set[str], b: Set[str]) -> float:
 
 
 def _semantic_similarity(a: str, b: str) -> float:
-    return difflib.SequenceMatcher(a=_normalize_sentence(a), b=_normalize_sentence(b)).ratio()
+    return _semantic_similarity_features(_sentence_features(a), _sentence_features(b))
 
 
 def _rule_similarity(a: str, b: str) -> float:
-    years_a = set(_extract_years(a))
-    years_b = set(_extract_years(b))
-    if years_a and years_b:
-        year_score = 1.0 if (years_a & years_b) else 0.0
-    else:
-        year_score = 0.5
-
-    ngram_score = _jaccard(_char_ngrams(a, n=2), _char_ngrams(b, n=2))
-    return 0.6 * ngram_score + 0.4 * year_score
+    return _rule_similarity_features(_sentence_features(a), _sentence_features(b))
 
 
 def _position_score(i: int, j: int, len_a: int, len_b: int) -> float:
@@ -85,30 +166,107 @@ def _position_score(i: int, j: int, len_a: int, len_b: int) -> float:
     return max(0.0, 1.0 - abs(ai - bj))
 
 
+@functools.lru_cache(maxsize=8)
+def _compile_negation(patterns: Tuple[str, ...]) -> Pattern[str]:
+    if not patterns:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(f"(?:{pat})" for pat in patterns))
+
+
+def _negation_scan(text: str) -> Tuple[bool, str]:
+    """One pass over text returning (has_negation, negation-stripped normalized core).
+
+    The combined pattern is keyed on the current NEGATION_PATTERNS contents, so runtime
+    edits to the lexicon are picked up without losing the single-pass scan.
+    """
+    stripped, hits = _compile_negation(tuple(NEGATION_PATTERNS)).subn("", text.lower())
+    return hits > 0, _normalize_sentence(stripped)
+
+
+def register_negation_patterns(*patterns: str):
+    """Extend NEGATION_PATTERNS at runtime; invalid regexes raise re.error before anything is added."""
+    for pat in patterns:
+        re.compile(pat)
+    for pat in patterns:
+        if pat not in NEGATION_PATTERNS:
+            NEGATION_PATTERNS.append(pat)
+
+
 def _has_negation(text: str) -> bool:
-    t = text.lower()
-    return any(re.search(pat, t) for pat in NEGATION_PATTERNS)
+    return _negation_scan(text)[0]
 
 
 def _strip_negation(text: str) -> str:
-    t = text.lower()
-    for pat in NEGATION_PATTERNS:
-        t = re.sub(pat, "", t)
-    return _normalize_sentence(t)
+    return _negation_scan(text)[1]
 
 
-def _is_negation_contradiction(a: str, b: str) -> bool:
-    a_neg = _has_negation(a)
-    b_neg = _has_negation(b)
-    if a_neg == b_neg:
-        return False
+class SentenceFeatures(NamedTuple):
+    """Per-sentence features computed once and shared by all pairwise scorers."""
+
+    text: str
+    normalized: str
+    ngrams: FrozenSet[str]
+    ngram_counts: Mapping[str, int]
+    years: FrozenSet[str]
+    negated: bool
+    core: str
+
+
+def _sentence_features(text: str) -> SentenceFeatures:
+    normalized = _normalize_sentence(text)
+    counts = _char_ngram_counts(normalized, n=2)
+    negated, core = _negation_scan(text)
+    return SentenceFeatures(
+        text=text,
+        normalized=normalized,
+        ngrams=frozenset(counts),
+        ngram_counts=counts,
+        years=frozenset(_extract_years(text)),
+        negated=negated,
+        core=core,
+    )
+
+
+def _build_features(sentences: List[str]) -> List[SentenceFeatures]:
+    return [_sentence_features(s) for s in sentences]
+
+
+def _semantic_similarity_features(fa: SentenceFeatures, fb: SentenceFeatures) -> float:
+    return difflib.SequenceMatcher(a=fa.normalized, b=fb.normalized).ratio()
+
 
-    a_core = _strip_negation(a)
-    b_core = _strip_negation(b)
-    if not a_core or not b_core:
-        return False
-    score = difflib.SequenceMatcher(a=a_core, b=b_core).ratio()
-    return score >= 0.82
+def _rule_similarity_features(fa: SentenceFeatures, fb: SentenceFeatures) -> float:
+    if fa.years and fb.years:
+        year_score = 1.0 if (fa.years & fb.years) else 0.0
+    else:
+        year_score = 0.5
+
+    ngram_score = _jaccard(fa.ngrams, fb.ngrams)
+    return 0.6 * ngram_score + 0.4 * year_score
+
+
+def _negation_core_ratio(fa: SentenceFeatures, fb: SentenceFeatures) -> Optional[float]:
+    """Return the core similarity of a contradicting pair, or None if the pair does not contradict."""
+    if fa.negated == fb.negated:
+        return None
+    if not fa.core or not fb.core:
+        return None
+    return _bounded_ratio(fa.core, fb.core, NEGATION_CORE_THRESHOLD)
+
+
+def _is_negation_contradiction_features(fa: SentenceFeatures, fb: SentenceFeatures) -> bool:
+    return _negation_core_ratio(fa, fb) is not None
+
+
+def _semantic_cutoff(rule: float, pos: float) -> float:
+    """Smallest semantic score that could still lift the pair to MATCH_THRESHOLD."""
+    if MATCH_W1 <= 0:
+        return 0.0
+    return (MATCH_THRESHOLD - MATCH_W2 * rule - MATCH_W3 * pos) / MATCH_W1 - _BOUND_EPS
+
+
+def _is_negation_contradiction(a: str, b: str) -> bool:
+    return _is_negation_contradiction_features(_sentence_features(a), _sentence_features(b))
 
 
 def _extract_subject_hint(text: str) -> str:
@@ -127,71 +285,169 @@ def _normalize_subject_name(subject: str) -> str:
     return s or subject
 
 
-def _extract_year_claims(sentences: List[str]) -> List[Dict]:
-    claims: List[Dict] = []
-    for idx, s in enumerate(sentences):
-        m_cn = re.search(
-            r"(?P<subject>[A-Za-z0-9\u4e00-\u9fff_-]{1,40})专利(?:申请)?于(?P<year>19\d{2}|20\d{2})年",
-            s,
-        )
-        if m_cn:
-            claims.append(
-                {
-                    "subject": _normalize_subject_name(m_cn.group("subject")),
-                    "year": m_cn.group("year"),
-                    "sentence": s,
-                    "sentence_index": idx,
-                }
-            )
-            continue
+class ClaimPattern(NamedTuple):
+    """Declarative claim extractor; `regex` must define `subject` and `value_group` groups."""
 
-        m_cn_alt1 = re.search(
-            r"(?P<subject>[A-Za-z0-9\u4e00-\u9fff_-]{1,40})(?:公司)?在(?P<year>19\d{2}|20\d{2})年(?:向[\u4e00-\u9fffA-Za-z0-9_-]{1,40})?(?:提交|递交|提出)(?:了)?(?:[\u4e00-\u9fffA-Za-z0-9_-]{0,20})专利(?:申请)?",
-            s,
-        )
-        if m_cn_alt1:
-            claims.append(
-                {
-                    "subject": _normalize_subject_name(m_cn_alt1.group("subject")),
-                    "year": m_cn_alt1.group("year"),
-                    "sentence": s,
-                    "sentence_index": idx,
-                }
-            )
-            continue
+    name: str
+    kind: str
+    regex: str
+    value_group: str
+    keywords: Tuple[str, ...] = ()
+    flags: int = 0
 
-        m_cn_alt2 = re.search(
-            r"(?P<subject>[A-Za-z0-9\u4e00-\u9fff_-]{1,40})(?:公司)?(?:的)?(?:[\u4e00-\u9fffA-Za-z0-9_-]{0,20})专利(?:是|为)?(?P<year>19\d{2}|20\d{2})年(?:申请|提交|公开)(?:的)?",
-            s,
-        )
-        if m_cn_alt2:
-            claims.append(
-                {
-                    "subject": _normalize_subject_name(m_cn_alt2.group("subject")),
-                    "year": m_cn_alt2.group("year"),
-                    "sentence": s,
-                    "sentence_index": idx,
-                }
-            )
-            continue
 
-        m_en = re.search(
-            r"(?P<subject>[A-Za-z0-9_-]{1,40})\s+(?:patent|application)\s+(?:was\s+)?filed\s+in\s+(?P<year>19\d{2}|20\d{2})",
-            s,
-            re.I,
+# Patterns of one kind are tried in list order; the first one that matches a sentence wins.
+CLAIM_PATTERNS: List[ClaimPattern] = [
+    ClaimPattern(
+        name="cn_patent_filed_in",
+        kind="year",
+        regex=r"(?P<subject>[A-Za-z0-9\u4e00-\u9fff_-]{1,40})专利(?:申请)?于(?P<year>19\d{2}|20\d{2})年",
+        value_group="year",
+        keywords=("专利",),
+    ),
+    ClaimPattern(
+        name="cn_submitted_in_year",
+        kind="year",
+        regex=r"(?P<subject>[A-Za-z0-9\u4e00-\u9fff_-]{1,40})(?:公司)?在(?P<year>19\d{2}|20\d{2})年(?:向[\u4e00-\u9fffA-Za-z0-9_-]{1,40})?(?:提交|递交|提出)(?:了)?(?:[\u4e00-\u9fffA-Za-z0-9_-]{0,20})专利(?:申请)?",
+        value_group="year",
+        keywords=("专利",),
+    ),
+    ClaimPattern(
+        name="cn_patent_is_year",
+        kind="year",
+        regex=r"(?P<subject>[A-Za-z0-9\u4e00-\u9fff_-]{1,40})(?:公司)?(?:的)?(?:[\u4e00-\u9fffA-Za-z0-9_-]{0,20})专利(?:是|为)?(?P<year>19\d{2}|20\d{2})年(?:申请|提交|公开)(?:的)?",
+        value_group="year",
+        keywords=("专利",),
+    ),
+    ClaimPattern(
+        name="en_patent_filed_in",
+        kind="year",
+        regex=r"(?P<subject>[A-Za-z0-9_-]{1,40})\s+(?:patent|application)\s+(?:was\s+)?filed\s+in\s+(?P<year>19\d{2}|20\d{2})",
+        value_group="year",
+        keywords=("patent", "application"),
+        flags=re.I,
+    ),
+]
+
+
+class _ClaimMatcher(NamedTuple):
+    combined: Pattern[str]
+    patterns: Tuple[Pattern[str], ...]
+    specs: Tuple[ClaimPattern, ...]
+    keywords: Tuple[str, ...]
+
+
+def register_claim_pattern(pattern: ClaimPattern):
+    """Add or replace (by name) a claim pattern; its kind is still extracted in a single scan."""
+    compiled = re.compile(pattern.regex, pattern.flags)
+    missing = {"subject", pattern.value_group} - set(compiled.groupindex)
+    if missing:
+        raise ValueError(f"claim pattern {pattern.name!r} lacks named groups: {sorted(missing)}")
+    for idx, existing in enumerate(CLAIM_PATTERNS):
+        if existing.name == pattern.name:
+            CLAIM_PATTERNS[idx] = pattern
+            return
+    CLAIM_PATTERNS.append(pattern)
+
+
+def _scoped_flags(flags: int) -> str:
+    letters = "".join(ch for flag, ch in ((re.I, "i"), (re.M, "m"), (re.S, "s"), (re.X, "x")) if flags & flag)
+    return f"?{letters}:" if letters else "?:"
+
+
+@functools.lru_cache(maxsize=16)
+def _compile_claim_kind(specs: Tuple[ClaimPattern, ...]) -> _ClaimMatcher:
+    # Group names are prefixed per alternative so they stay unique in the combined pattern.
+    alternatives = []
+    for k, spec in enumerate(specs):
+        body = spec.regex.replace("(?P<", f"(?P<_c{k}_").replace("(?P=", f"(?P=_c{k}_")
+        alternatives.append(f"(?P<_c{k}>({_scoped_flags(spec.flags)}{body}))")
+    keywords: Tuple[str, ...] = ()
+    if all(spec.keywords for spec in specs):
+        keywords = tuple(dict.fromkeys(kw.lower() for spec in specs for kw in spec.keywords))
+    return _ClaimMatcher(
+        combined=re.compile("|".join(alternatives)),
+        patterns=tuple(re.compile(spec.regex, spec.flags) for spec in specs),
+        specs=specs,
+        keywords=keywords,
+    )
+
+
+def _match_claim(matcher: _ClaimMatcher, text: str) -> Optional[Tuple[ClaimPattern, Dict[str, str]]]:
+    m = matcher.combined.search(text)
+    if not m:
+        return None
+    k = int(m.lastgroup[2:])
+    # Higher-priority patterns cannot match at or before m.start(), but may match later.
+    for j in range(k):
+        earlier = matcher.patterns[j].search(text, m.start() + 1)
+        if earlier:
+            return matcher.specs[j], earlier.groupdict()
+    prefix = f"_c{k}_"
+    groups = {name[len(prefix) :]: value for name, value in m.groupdict().items() if name.startswith(prefix)}
+    return matcher.specs[k], groups
+
+
+def _extract_claims(kind: str, indexed_sentences: List[Tuple[int, str]]) -> List[Dict]:
+    specs = tuple(p for p in CLAIM_PATTERNS if p.kind == kind)
+    if not specs:
+        return []
+    matcher = _compile_claim_kind(specs)
+    claims: List[Dict] = []
+    for idx, s in indexed_sentences:
+        if matcher.keywords:
+            lowered = s.lower()
+            if not any(kw in lowered for kw in matcher.keywords):
+                continue
+        found = _match_claim(matcher, s)
+        if not found:
+            continue
+        spec, groups = found
+        claims.append(
+            {
+                "subject": _normalize_subject_name(groups["subject"]),
+                spec.value_group: groups[spec.value_group],
+                "sentence": s,
+                "sentence_index": idx,
+            }
         )
-        if m_en:
-            claims.append(
-                {
-                    "subject": _normalize_subject_name(m_en.group("subject")),
-                    "year": m_en.group("year"),
-                    "sentence": s,
-                    "sentence_index": idx,
-                }
-            )
     return claims
 
 
+def _extract_year_claims(
+    sentences: List[str],
+    features: Optional[List[SentenceFeatures]] = None,
+) -> List[Dict]:
+    if features is None:
+        features = _build_features(sentences)
+    # Every year pattern captures a year, so year-free sentences cannot match.
+    return _extract_claims("year", [(idx, f.text) for idx, f in enumerate(features) if f.years])
+
+
+def _document_similarity(answer_a: str, answer_b: str, mode: str) -> Optional[float]:
+    """Whole-answer similarity_ratio.
+
+    "exact" is SequenceMatcher.ratio() (quadratic worst case).  "approx" is linear time:
+    min(quick_ratio, bigram bound) from character and bigram multisets.  Both terms are
+    upper bounds, so exact <= approx <= 1 and the error is approx - exact >= 0; it is
+    small when the answers differ mostly by substitutions and largest for reordered
+    text.  It is an upper bound only, not an estimate of the ratio: do not apply
+    thresholds tuned on "exact" to it.  "off" skips the computation and returns None.
+    """
+    if mode not in SIMILARITY_MODES:
+        raise ValueError(f"unknown similarity mode {mode!r}; expected one of {SIMILARITY_MODES}.")
+    if mode == "off":
+        return None
+    if mode == "exact":
+        return difflib.SequenceMatcher(a=answer_a, b=answer_b).ratio()
+    total = len(answer_a) + len(answer_b)
+    if not total:
+        return 1.0
+    quick = 2.0 * sum((Counter(answer_a) & Counter(answer_b)).values()) / total
+    shared = sum((_char_ngram_counts(answer_a) & _char_ngram_counts(answer_b)).values())
+    return min(quick, _semantic_upper_bound(shared, len(answer_a), len(answer_b)))
+
+
 def _first_sentence_with_year(sentences: List[str]) -> str:
     for s in sentences:
         if _extract_years(s):
@@ -199,19 +455,396 @@ def _first_sentence_with_year(sentences: List[str]) -> str:
     return ""
 
 
-def _match_sentences(a_sents: List[str], b_sents: List[str]) -> List[Dict]:
+def _semantic_upper_bound(shared: int, len_a: int, len_b: int) -> float:
+    """Upper bound of SequenceMatcher.ratio() from the shared bigram multiset size.
+
+    Matching blocks are ordered and disjoint, so each adjacent character pair inside
+    a block is a bigram occurrence present in both strings (M - k <= shared), and two
+    consecutive blocks are separated by at least one unmatched character
+    (k - 1 <= n - 2M).  Hence 3M <= shared + n + 1 with ratio = 2M / n.
+    """
+    n = len_a + len_b
+    if n == 0:
+        return 1.0
+    return min(1.0, 2.0 * min(len_a, len_b) / n, 2.0 * (shared + n + 1) / (3.0 * n))
+
+
+def _max_zero_overlap_length() -> float:
+    """Largest len_a + len_b at which a pair sharing no bigram can still pass MATCH_THRESHOLD.
+
+    Without shared bigrams the n-gram term is 0, so the best possible score is
+    W1 * (2 / 3 + 2 / (3n)) + W2 * 0.4 + W3; solve it against the threshold.
+    """
+    slack = MATCH_THRESHOLD - _BOUND_EPS - MATCH_W2 * 0.4 - MATCH_W3
+    if slack <= 0:
+        return math.inf
+    if MATCH_W1 <= 0:
+        return 0
+    ratio = slack / MATCH_W1
+    if ratio > 1.0:
+        return 0
+    if ratio <= 2.0 / 3.0:
+        return math.inf
+    return math.floor(2.0 / (3.0 * (ratio - 2.0 / 3.0)))
+
+
+def _candidate_pairs(
+    a_feats: List[SentenceFeatures],
+    b_feats: List[SentenceFeatures],
+    rows: Optional[Sequence[int]] = None,
+    cols: Optional[Sequence[int]] = None,
+) -> Iterator[Tuple[int, int, int]]:
+    """Yield (i, j, shared_bigrams) in row-major order for pairs that may pass MATCH_THRESHOLD.
+
+    Pairs sharing at least one bigram come from the inverted index on side B; pairs
+    sharing none are only kept when short enough for _max_zero_overlap_length().
+    rows/cols restrict the search to a sub-block of the pair space (ascending indices).
+    """
+    rows = range(len(a_feats)) if rows is None else rows
+    cols = range(len(b_feats)) if cols is None else cols
+    index: Dict[str, List[Tuple[int, int]]] = {}
+    for j in cols:
+        for gram, count in b_feats[j].ngram_counts.items():
+            index.setdefault(gram, []).append((j, count))
+    max_zero = _max_zero_overlap_length()
+    by_len = sorted(cols, key=lambda j: len(b_feats[j].normalized))
+    b_lens = [len(b_feats[j].normalized) for j in by_len]
+    empty_b = [j for j in by_len if not b_feats[j].ngrams]
+
+    for i in rows:
+        fa = a_feats[i]
+        shared: Dict[int, int] = {}
+        for gram, count in fa.ngram_counts.items():
+            for j, b_count in index.get(gram, ()):
+                shared[j] = shared.get(j, 0) + min(count, b_count)
+
+        if max_zero == math.inf:
+            extra = cols
+        else:
+            limit = max_zero - len(fa.normalized)
+            extra = by_len[: bisect.bisect_right(b_lens, limit)] if limit >= 0 else []
+        for j in extra:
+            shared.setdefault(j, 0)
+        if not fa.ngrams:
+            # Two empty bigram sets have Jaccard 1.0, which the zero-overlap bound ignores.
+            for j in empty_b:
+                shared.setdefault(j, 0)
+
+        for j in sorted(shared):
+            yield i, j, shared[j]
+
+
+def _score_candidates_python(
+    a_feats: List[SentenceFeatures],
+    b_feats: List[SentenceFeatures],
+    blocks: Optional[List[Tuple[Sequence[int], Sequence[int]]]] = None,
+) -> List[Tuple[float, float, int, int, float, float, float]]:
+    if blocks is None:
+        pairs: Iterable[Tuple[int, int, int]] = _candidate_pairs(a_feats, b_feats)
+    else:
+        pairs = itertools.chain.from_iterable(
+            _candidate_pairs(a_feats, b_feats, rows, cols) for rows, cols in blocks
+        )
     candidates: List[Tuple[float, float, int, int, float, float, float]] = []
-    for i, sa in enumerate(a_sents):
-        for j, sb in enumerate(b_sents):
-            # Keep contradiction candidates out of consensus matching.
-            if _is_negation_contradiction(sa, sb):
+    for i, j, shared in pairs:
+        fa = a_feats[i]
+        fb = b_feats[j]
+        rule = _rule_similarity_features(fa, fb)
+        pos = _position_score(i, j, len(a_feats), len(b_feats))
+        semantic_ub = _semantic_upper_bound(shared, len(fa.normalized), len(fb.normalized))
+        if MATCH_W1 * semantic_ub + MATCH_W2 * rule + MATCH_W3 * pos < MATCH_THRESHOLD - _BOUND_EPS:
+            continue
+        # Keep contradiction candidates out of consensus matching.
+        if _is_negation_contradiction_features(fa, fb):
+            continue
+        semantic = _bounded_ratio(fa.normalized, fb.normalized, _semantic_cutoff(rule, pos))
+        if semantic is None:
+            continue
+        score = MATCH_W1 * semantic + MATCH_W2 * rule + MATCH_W3 * pos
+        if score >= MATCH_THRESHOLD:
+            candidates.append((score, semantic, i, j, rule, pos, score))
+    return candidates
+
+
+_OVERLAP_CHUNK = 1 << 18
+
+
+def _sparse_overlap(a_items: List[Mapping[str, int]], b_items: List[Mapping[str, int]]):
+    """Return (shared, common) len(a) x len(b) matrices from sparse token counts.
+
+    shared[i, j] = sum_t min(a_i[t], b_j[t]) and common[i, j] = |tokens(a_i) & tokens(b_j)|.
+    Rows are kept as COO triples and joined on token id, so memory is
+    O(nnz + matched token pairs + len(a) * len(b)) instead of sentences x vocabulary.
+    """
+    len_a, len_b = len(a_items), len(b_items)
+    vocab: Dict[str, int] = {}
+
+    def _coo(items: List[Mapping[str, int]]):
+        rows, cols, counts = [], [], []
+        for row, item in enumerate(items):
+            for token, count in item.items():
+                rows.append(row)
+                cols.append(vocab.setdefault(token, len(vocab)))
+                counts.append(count)
+        return (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), np.array(counts, dtype=np.float64))
+
+    a_rows, a_cols, a_counts = _coo(a_items)
+    b_rows, b_cols, b_counts = _coo(b_items)
+    order = np.argsort(b_cols, kind="stable")
+    b_rows, b_cols, b_counts = b_rows[order], b_cols[order], b_counts[order]
+    # For every (row, token) entry of A, the run of B entries with the same token.
+    lo = np.searchsorted(b_cols, a_cols, side="left")
+    runs = np.searchsorted(b_cols, a_cols, side="right") - lo
+    size = len_a * len_b
+    shared = np.zeros(size)
+    common = np.zeros(size)
+    ends = np.cumsum(runs)
+    start = 0
+    while start < len(a_cols):
+        # Expand at most _OVERLAP_CHUNK matched pairs at a time to bound peak memory.
+        base = ends[start] - runs[start]
+        stop = max(start + 1, int(np.searchsorted(ends, base + _OVERLAP_CHUNK, side="right")))
+        part = runs[start:stop]
+        count = int(part.sum())
+        if count:
+            ia = np.repeat(np.arange(start, stop), part)
+            ib = np.repeat(lo[start:stop] - (ends[start:stop] - part - base), part) + np.arange(count)
+            cell = a_rows[ia] * len_b + b_rows[ib]
+            shared += np.bincount(cell, weights=np.minimum(a_counts[ia], b_counts[ib]), minlength=size)
+            common += np.bincount(cell, minlength=size)
+        start = stop
+    return shared.reshape(len_a, len_b), common.reshape(len_a, len_b)
+
+
+def _score_candidates_numpy(
+    a_feats: List[SentenceFeatures],
+    b_feats: List[SentenceFeatures],
+    blocks: Optional[List[Tuple[Sequence[int], Sequence[int]]]] = None,
+) -> List[Tuple[float, float, int, int, float, float, float]]:
+    """Vectorized counterpart of _score_candidates_python with identical output.
+
+    The n-gram Jaccard, year-overlap and position terms are exact float64 matrices
+    over sentence pairs; token overlaps come from a sparse join (_sparse_overlap),
+    never a dense sentence x vocabulary matrix.  The shared bigram multiset size
+    feeds the same semantic upper bound, and SequenceMatcher runs only on cells
+    that survive it.
+    """
+    if np is None:
+        raise RuntimeError("engine='numpy' requires numpy; install it or use engine='python'.")
+    len_a = len(a_feats)
+    len_b = len(b_feats)
+    if not len_a or not len_b:
+        return []
+
+    shared, inter = _sparse_overlap([f.ngram_counts for f in a_feats], [f.ngram_counts for f in b_feats])
+
+    # Distinct-set Jaccard, matching _jaccard() including its empty-set conventions.
+    size_a = np.array([len(f.ngrams) for f in a_feats], dtype=np.float64)[:, None]
+    size_b = np.array([len(f.ngrams) for f in b_feats], dtype=np.float64)[None, :]
+    union = size_a + size_b - inter
+    jaccard = inter / np.maximum(1.0, union)
+    jaccard = np.where((size_a == 0) | (size_b == 0), 0.0, jaccard)
+    jaccard = np.where((size_a == 0) & (size_b == 0), 1.0, jaccard)
+
+    _, year_common = _sparse_overlap(
+        [dict.fromkeys(f.years, 1) for f in a_feats], [dict.fromkeys(f.years, 1) for f in b_feats]
+    )
+    year_hit = year_common > 0
+    has_years = np.array([bool(f.years) for f in a_feats])[:, None] & np.array([bool(f.years) for f in b_feats])[None, :]
+    year_score = np.where(has_years, np.where(year_hit, 1.0, 0.0), 0.5)
+    rule = 0.6 * jaccard + 0.4 * year_score
+
+    if len_a <= 1 and len_b <= 1:
+        pos = np.ones((len_a, len_b), dtype=np.float64)
+    else:
+        ai = np.arange(len_a, dtype=np.float64)[:, None] / max(1, len_a - 1)
+        bj = np.arange(len_b, dtype=np.float64)[None, :] / max(1, len_b - 1)
+        pos = np.maximum(0.0, 1.0 - np.abs(ai - bj))
+
+    norm_a = np.array([len(f.normalized) for f in a_feats], dtype=np.float64)[:, None]
+    norm_b = np.array([len(f.normalized) for f in b_feats], dtype=np.float64)[None, :]
+    total = norm_a + norm_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        semantic_ub = np.minimum(
+            1.0,
+            np.minimum(2.0 * np.minimum(norm_a, norm_b) / total, 2.0 * (shared + total + 1.0) / (3.0 * total)),
+        )
+    semantic_ub = np.where(total == 0, 1.0, semantic_ub)
+
+    upper = MATCH_W1 * semantic_ub + MATCH_W2 * rule + MATCH_W3 * pos
+    if blocks is not None:
+        allowed = np.zeros((len_a, len_b), dtype=bool)
+        for rows, cols in blocks:
+            allowed[np.ix_(list(rows), list(cols))] = True
+        upper = np.where(allowed, upper, -math.inf)
+    candidates: List[Tuple[float, float, int, int, float, float, float]] = []
+    for i, j in zip(*np.nonzero(upper >= MATCH_THRESHOLD - _BOUND_EPS)):
+        i = int(i)
+        j = int(j)
+        fa = a_feats[i]
+        fb = b_feats[j]
+        if _is_negation_contradiction_features(fa, fb):
+            continue
+        cell_rule = float(rule[i, j])
+        cell_pos = float(pos[i, j])
+        semantic = _bounded_ratio(fa.normalized, fb.normalized, _semantic_cutoff(cell_rule, cell_pos))
+        if semantic is None:
+            continue
+        score = MATCH_W1 * semantic + MATCH_W2 * cell_rule + MATCH_W3 * cell_pos
+        if score >= MATCH_THRESHOLD:
+            candidates.append((score, semantic, i, j, cell_rule, cell_pos, score))
+    return candidates
+
+
+def _sentence_blocks(text: str, block_size: int) -> List[range]:
+    """Sentence index ranges of the paragraphs in text, with long paragraphs chunked."""
+    spans: List[range] = []
+    start = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        count = len(_split_sentences(paragraph))
+        for offset in range(0, count, block_size):
+            spans.append(range(start + offset, start + min(count, offset + block_size)))
+        start += count
+    return spans
+
+
+def _align_blocks(
+    a_blocks: List[range],
+    b_blocks: List[range],
+    a_feats: List[SentenceFeatures],
+    b_feats: List[SentenceFeatures],
+    window: int,
+) -> List[Tuple[range, List[int]]]:
+    """Pair each block with its most similar counterpart (bigram-set Jaccard) in both directions.
+
+    Ties and signature-free blocks fall back to the closest relative position.  Each A
+    block is then searched against its partners' B blocks plus `window` neighbours.
+    """
+    a_sigs = [frozenset().union(*(a_feats[i].ngrams for i in blk)) for blk in a_blocks]
+    b_sigs = [frozenset().union(*(b_feats[j].ngrams for j in blk)) for blk in b_blocks]
+
+    def _rel(idx: int, count: int) -> float:
+        return idx / max(1, count - 1)
+
+    def _best(sig: FrozenSet[str], idx: int, count: int, others: List[FrozenSet[str]]) -> int:
+        return max(
+            range(len(others)),
+            key=lambda k: (_jaccard(sig, others[k]), -abs(_rel(idx, count) - _rel(k, len(others)))),
+        )
+
+    partners: Dict[int, Set[int]] = {p: set() for p in range(len(a_blocks))}
+    for p, sig in enumerate(a_sigs):
+        partners[p].add(_best(sig, p, len(a_blocks), b_sigs))
+    for q, sig in enumerate(b_sigs):
+        partners[_best(sig, q, len(b_blocks), a_sigs)].add(q)
+
+    blocks: List[Tuple[range, List[int]]] = []
+    for p, qs in sorted(partners.items()):
+        near = {k for q in qs for k in range(max(0, q - window), min(len(b_blocks), q + window + 1))}
+        cols = sorted(j for k in near for j in b_blocks[k])
+        blocks.append((a_blocks[p], cols))
+    return blocks
+
+
+class _PairMemo:
+    """Position-independent pair scores of two growing sentence lists, kept across calls.
+
+    IncrementalComparator re-diffs a prefix every time a sentence completes.  Semantic,
+    rule and negation scores of a pair never change as the prefixes grow (only the
+    position term does), so extend() scores each new sentence against the other side
+    once, and _match_sentences / _detect_contradictions read the stored results.
+    A pair is kept for matching if it could pass MATCH_THRESHOLD at the best position.
+    """
+
+    def __init__(self):
+        self.len_a = 0
+        self.len_b = 0
+        self.match: Dict[int, Dict[int, Tuple[float, float]]] = {}  # i -> {j: (semantic, rule)}
+        self.negation: Dict[Tuple[int, int], float] = {}
+
+    def extend(self, a_feats: List[SentenceFeatures], b_feats: List[SentenceFeatures]):
+        old_a, old_b = self.len_a, self.len_b
+        len_a, len_b = len(a_feats), len(b_feats)
+        if len_a < old_a or len_b < old_b:
+            raise ValueError("_PairMemo only supports growing sentence lists.")
+        pairs: List[Iterable[Tuple[int, int, int]]] = []
+        if len_b > old_b and old_a:
+            pairs.append(_candidate_pairs(a_feats, b_feats, range(old_a), range(old_b, len_b)))
+        if len_a > old_a and len_b:
+            pairs.append(_candidate_pairs(a_feats, b_feats, range(old_a, len_a), range(len_b)))
+        new_cells = [(i, j) for i in range(old_a) for j in range(old_b, len_b)]
+        new_cells += [(i, j) for i in range(old_a, len_a) for j in range(len_b)]
+        for i, j in new_cells:
+            if a_feats[i].negated != b_feats[j].negated:
+                score = _negation_core_ratio(a_feats[i], b_feats[j])
+                if score is not None:
+                    self.negation[(i, j)] = score
+        for i, j, shared in itertools.chain.from_iterable(pairs):
+            fa = a_feats[i]
+            fb = b_feats[j]
+            rule = _rule_similarity_features(fa, fb)
+            semantic_ub = _semantic_upper_bound(shared, len(fa.normalized), len(fb.normalized))
+            if MATCH_W1 * semantic_ub + MATCH_W2 * rule + MATCH_W3 < MATCH_THRESHOLD - _BOUND_EPS:
+                continue
+            if (i, j) in self.negation:
                 continue
-            semantic = _semantic_similarity(sa, sb)
-            rule = _rule_similarity(sa, sb)
-            pos = _position_score(i, j, len(a_sents), len(b_sents))
+            semantic = _bounded_ratio(fa.normalized, fb.normalized, _semantic_cutoff(rule, 1.0))
+            if semantic is not None:
+                self.match.setdefault(i, {})[j] = (semantic, rule)
+        self.len_a, self.len_b = len_a, len_b
+
+    def candidates(
+        self,
+        len_a: int,
+        len_b: int,
+        blocks: Optional[List[Tuple[Sequence[int], Sequence[int]]]] = None,
+    ) -> List[Tuple[float, float, int, int, float, float, float]]:
+        """Same list (and order) as _score_candidates_python for the current prefixes."""
+        if blocks is None:
+            cells: Iterable[Tuple[int, int]] = (
+                (i, j) for i in sorted(self.match) for j in sorted(self.match[i])
+            )
+        else:
+            cells = (
+                (i, j)
+                for rows, cols in blocks
+                for i in rows
+                if i in self.match
+                for j in cols
+                if j in self.match[i]
+            )
+        candidates: List[Tuple[float, float, int, int, float, float, float]] = []
+        for i, j in cells:
+            semantic, rule = self.match[i][j]
+            pos = _position_score(i, j, len_a, len_b)
             score = MATCH_W1 * semantic + MATCH_W2 * rule + MATCH_W3 * pos
             if score >= MATCH_THRESHOLD:
                 candidates.append((score, semantic, i, j, rule, pos, score))
+        return candidates
+
+
+def _match_sentences(
+    a_sents: List[str],
+    b_sents: List[str],
+    a_feats: Optional[List[SentenceFeatures]] = None,
+    b_feats: Optional[List[SentenceFeatures]] = None,
+    engine: str = "python",
+    blocks: Optional[List[Tuple[Sequence[int], Sequence[int]]]] = None,
+    memo: Optional[_PairMemo] = None,
+) -> List[Dict]:
+    """Greedy one-to-one sentence alignment; `blocks` limits scoring to (rows, cols) sub-blocks."""
+    if engine not in MATCH_ENGINES:
+        raise ValueError(f"unknown match engine {engine!r}; expected one of {MATCH_ENGINES}.")
+    if a_feats is None:
+        a_feats = _build_features(a_sents)
+    if b_feats is None:
+        b_feats = _build_features(b_sents)
+    if memo is not None:
+        candidates = memo.candidates(len(a_feats), len(b_feats), blocks)
+    elif engine == "numpy":
+        candidates = _score_candidates_numpy(a_feats, b_feats, blocks)
+    else:
+        candidates = _score_candidates_python(a_feats, b_feats, blocks)
 
     candidates.sort(reverse=True, key=lambda x: (x[0], x[1]))
     used_a: Set[int] = set()
@@ -242,16 +875,28 @@ def _detect_contradictions(
     b_only_indices: List[int],
     a_sents: List[str],
     b_sents: List[str],
+    a_feats: Optional[List[SentenceFeatures]] = None,
+    b_feats: Optional[List[SentenceFeatures]] = None,
+    memo: Optional[_PairMemo] = None,
 ) -> List[Dict]:
+    if a_feats is None:
+        a_feats = _build_features(a_sents)
+    if b_feats is None:
+        b_feats = _build_features(b_sents)
     candidates: List[Tuple[float, int, int]] = []
-    for i in a_only_indices:
-        for j in b_only_indices:
-            sa = a_sents[i]
-            sb = b_sents[j]
-            if not _is_negation_contradiction(sa, sb):
-                continue
-            base_score = difflib.SequenceMatcher(a=_strip_negation(sa), b=_strip_negation(sb)).ratio()
-            candidates.append((base_score, i, j))
+    if memo is not None:
+        only_a = set(a_only_indices)
+        only_b = set(b_only_indices)
+        for (i, j), base_score in sorted(memo.negation.items()):
+            if i in only_a and j in only_b:
+                candidates.append((base_score, i, j))
+    else:
+        for i in a_only_indices:
+            for j in b_only_indices:
+                base_score = _negation_core_ratio(a_feats[i], b_feats[j])
+                if base_score is None:
+                    continue
+                candidates.append((base_score, i, j))
 
     candidates.sort(reverse=True, key=lambda x: x[0])
     used_a: Set[int] = set()
@@ -279,11 +924,56 @@ def _detect_contradictions(
     return contradictions
 
 
-def compare_answers(answer_a: str, answer_b: str) -> Dict:
-    a_sents = _split_sentences(answer_a)
-    b_sents = _split_sentences(answer_b)
+def compare_answers(
+    answer_a: str,
+    answer_b: str,
+    engine: str = "python",
+    similarity_mode: str = "exact",
+    hierarchical: Optional[bool] = None,
+) -> Dict:
+    """Diff two answers sentence by sentence.
+
+    hierarchical=None switches to block-level alignment automatically once either
+    answer reaches HIERARCHICAL_MIN_SENTENCES; True/False force the mode.
+    """
+    a_feats = _build_features(_split_sentences(answer_a))
+    b_feats = _build_features(_split_sentences(answer_b))
+    return _compare_features(answer_a, answer_b, a_feats, b_feats, engine, similarity_mode, hierarchical)
+
 
-    matches = _match_sentences(a_sents, b_sents)
+def _compare_features(
+    answer_a: str,
+    answer_b: str,
+    a_feats: List[SentenceFeatures],
+    b_feats: List[SentenceFeatures],
+    engine: str = "python",
+    similarity_mode: str = "exact",
+    hierarchical: Optional[bool] = None,
+    memo: Optional[_PairMemo] = None,
+) -> Dict:
+    """compare_answers() body for callers that already hold the per-sentence features.
+
+    memo (see _PairMemo) replaces the pairwise scoring for callers re-diffing growing prefixes.
+    """
+    a_sents = [f.text for f in a_feats]
+    b_sents = [f.text for f in b_feats]
+
+    if hierarchical is None:
+        hierarchical = max(len(a_sents), len(b_sents)) >= HIERARCHICAL_MIN_SENTENCES
+    blocks: Optional[List[Tuple[range, List[int]]]] = None
+    pair_space = len(a_sents) * len(b_sents)
+    pairs_considered = pair_space
+    if hierarchical:
+        a_blocks = _sentence_blocks(answer_a, HIERARCHICAL_BLOCK_SIZE)
+        b_blocks = _sentence_blocks(answer_b, HIERARCHICAL_BLOCK_SIZE)
+        blocks = []
+        if a_blocks and b_blocks:
+            blocks = _align_blocks(a_blocks, b_blocks, a_feats, b_feats, HIERARCHICAL_WINDOW)
+        pairs_considered = sum(len(rows) * len(cols) for rows, cols in blocks)
+
+    if memo is not None:
+        memo.extend(a_feats, b_feats)
+    matches = _match_sentences(a_sents, b_sents, a_feats, b_feats, engine=engine, blocks=blocks, memo=memo)
     matched_a = {m["a_index"] for m in matches}
     matched_b = {m["b_index"] for m in matches}
 
@@ -296,8 +986,8 @@ def compare_answers(answer_a: str, answer_b: str) -> Dict:
 
     conflicts: List[Dict] = []
 
-    claims_a = _extract_year_claims(a_sents)
-    claims_b = _extract_year_claims(b_sents)
+    claims_a = _extract_year_claims(a_sents, a_feats)
+    claims_b = _extract_year_claims(b_sents, b_feats)
     map_a = {c["subject"]: c for c in claims_a}
     map_b = {c["subject"]: c for c in claims_b}
 
@@ -346,7 +1036,9 @@ def compare_answers(answer_a: str, answer_b: str) -> Dict:
         )
 
     # Type 3: contradiction (opposite polarity on similar statements)
-    contradictions = _detect_contradictions(a_only_indices, b_only_indices, a_sents, b_sents)
+    contradictions = _detect_contradictions(
+        a_only_indices, b_only_indices, a_sents, b_sents, a_feats, b_feats, memo=memo
+    )
     conflicts.extend(contradictions)
 
     years_a = _extract_years(answer_a)
@@ -366,7 +1058,7 @@ def compare_answers(answer_a: str, answer_b: str) -> Dict:
             }
         )
 
-    similarity = difflib.SequenceMatcher(a=answer_a, b=answer_b).ratio()
+    similarity = _document_similarity(answer_a, answer_b, similarity_mode)
 
     summary_bits = []
     if consensus:
@@ -382,7 +1074,8 @@ def compare_answers(answer_a: str, answer_b: str) -> Dict:
 
     return {
         "summary": "，".join(summary_bits),
-        "similarity_ratio": round(similarity, 4),
+        "similarity_ratio": round(similarity, 4) if similarity is not None else None,
+        "similarity_mode": similarity_mode,
         "consensus": consensus,
         "model_a_only": a_only,
         "model_b_only": b_only,
@@ -392,4 +1085,209 @@ def compare_answers(answer_a: str, answer_b: str) -> Dict:
         "model_b_only_indices": b_only_indices,
         "sentence_matches": matches,
         "conflicts": conflicts,
+        "match_stats": {
+            "mode": "hierarchical" if hierarchical else "flat",
+            "pair_space": pair_space,
+            "pairs_considered": pairs_considered,
+            "skipped_ratio": round(1.0 - pairs_considered / pair_space, 4) if pair_space else 0.0,
+        },
+    }
+
+
+def _detector_config() -> Dict[str, Any]:
+    """Snapshot of the module-level tunables that affect compare_answers output."""
+    return {
+        "MATCH_W1": MATCH_W1,
+        "MATCH_W2": MATCH_W2,
+        "MATCH_W3": MATCH_W3,
+        "MATCH_THRESHOLD": MATCH_THRESHOLD,
+        "NEGATION_CORE_THRESHOLD": NEGATION_CORE_THRESHOLD,
+        "NEGATION_PATTERNS": list(NEGATION_PATTERNS),
+        "CLAIM_PATTERNS": list(CLAIM_PATTERNS),
+        "HIERARCHICAL_MIN_SENTENCES": HIERARCHICAL_MIN_SENTENCES,
+        "HIERARCHICAL_BLOCK_SIZE": HIERARCHICAL_BLOCK_SIZE,
+        "HIERARCHICAL_WINDOW": HIERARCHICAL_WINDOW,
     }
+
+
+def _apply_detector_config(config: Dict[str, Any]):
+    global MATCH_W1, MATCH_W2, MATCH_W3, MATCH_THRESHOLD, NEGATION_CORE_THRESHOLD
+    global HIERARCHICAL_MIN_SENTENCES, HIERARCHICAL_BLOCK_SIZE, HIERARCHICAL_WINDOW
+    MATCH_W1 = config["MATCH_W1"]
+    MATCH_W2 = config["MATCH_W2"]
+    MATCH_W3 = config["MATCH_W3"]
+    MATCH_THRESHOLD = config["MATCH_THRESHOLD"]
+    NEGATION_CORE_THRESHOLD = config["NEGATION_CORE_THRESHOLD"]
+    NEGATION_PATTERNS[:] = config["NEGATION_PATTERNS"]
+    CLAIM_PATTERNS[:] = config["CLAIM_PATTERNS"]
+    HIERARCHICAL_MIN_SENTENCES = config["HIERARCHICAL_MIN_SENTENCES"]
+    HIERARCHICAL_BLOCK_SIZE = config["HIERARCHICAL_BLOCK_SIZE"]
+    HIERARCHICAL_WINDOW = config["HIERARCHICAL_WINDOW"]
+
+
+def _chunked(items: Iterable[Tuple[str, str]], size: int) -> Iterator[List[Tuple[str, str]]]:
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _compare_chunk(chunk: List[Tuple[str, str]], options: Dict[str, Any], config: Dict[str, Any]) -> List[Dict]:
+    # Workers may be spawned fresh, so re-apply the parent's runtime tuning first.
+    _apply_detector_config(config)
+    return [compare_answers(a, b, **options) for a, b in chunk]
+
+
+def compare_many(
+    pairs: Iterable[Tuple[str, str]],
+    workers: Optional[int] = None,
+    chunksize: int = 32,
+    engine: str = "python",
+    similarity_mode: str = "exact",
+    hierarchical: Optional[bool] = None,
+) -> Iterator[Dict]:
+    """Yield compare_answers() results for many (answer_a, answer_b) pairs, in input order.
+
+    By default (workers=None or 1) the pairs are compared serially in this process.
+    With an explicit workers > 1 they are split into chunks and spread over a process
+    pool; at most 2 * workers chunks are in flight, so a large or lazy input stream is
+    consumed incrementally and memory stays flat.  The pool only pays off with several
+    cores and long answers; measure with experiments/run_compare_many_benchmark.py.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1.")
+    options = {"engine": engine, "similarity_mode": similarity_mode, "hierarchical": hierarchical}
+    if workers is None or workers <= 1:
+        for a, b in pairs:
+            yield compare_answers(a, b, **options)
+        return
+
+    config = _detector_config()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    max_in_flight = 2 * workers
+    pending: deque = deque()
+    try:
+        for chunk in _chunked(pairs, chunksize):
+            pending.append(pool.submit(_compare_chunk, chunk, options, config))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class IncrementalComparator:
+    """Divergence detection over two answers that arrive as text chunks.
+
+    feed() buffers each side, and every time a sentence completes (per the
+    _split_sentences delimiters) the diff of the completed prefixes is refreshed and
+    returned as events: "sentence", "match" / "match_retracted" and "conflict" /
+    "conflict_retracted".  Sentence features and pair scores are computed once and
+    reused (_PairMemo), so each new sentence is only scored against the other side.
+    Refreshes are throttled: one runs once the completed sentences have grown by
+    refresh_ratio (default 5%) since the last one, so long streams refresh O(log n)
+    times; "sentence" events are never delayed.  refresh_ratio=0 refreshes per sentence.
+    finish() returns the diff of the full texts, identical to compare_answers().
+    """
+
+    _DELIMITERS = re.compile(r"[。！？!?;\n]")
+
+    def __init__(
+        self,
+        engine: str = "python",
+        similarity_mode: str = "exact",
+        hierarchical: Optional[bool] = None,
+        refresh_ratio: float = 0.05,
+    ):
+        if refresh_ratio < 0:
+            raise ValueError("refresh_ratio must be >= 0.")
+        self.engine = engine
+        self.similarity_mode = similarity_mode
+        self.hierarchical = hierarchical
+        self.refresh_ratio = refresh_ratio
+        self._unrefreshed = 0
+        self._text = {"A": "", "B": ""}
+        self._done = {"A": 0, "B": 0}  # length of the completed-sentence prefix
+        self._feats: Dict[str, List[SentenceFeatures]] = {"A": [], "B": []}
+        self._cache: Dict[str, SentenceFeatures] = {}
+        self._matches: Dict[Tuple[int, int], Dict] = {}
+        self._conflicts: Dict[str, Dict] = {}
+        self._memo = _PairMemo()
+
+    def _features(self, sentence: str) -> SentenceFeatures:
+        feat = self._cache.get(sentence)
+        if feat is None:
+            feat = self._cache[sentence] = _sentence_features(sentence)
+        return feat
+
+    def text(self, side: str) -> str:
+        return self._text[side]
+
+    def feed(self, side: str, chunk: str) -> List[Dict]:
+        if side not in self._text:
+            raise ValueError("side must be 'A' or 'B'.")
+        self._text[side] += chunk
+        text = self._text[side]
+        last = None
+        for m in self._DELIMITERS.finditer(text, self._done[side]):
+            last = m
+        if last is None:
+            return []
+        fresh = _split_sentences(text[self._done[side] : last.end()])
+        self._done[side] = last.end()
+        events: List[Dict] = []
+        for sentence in fresh:
+            self._feats[side].append(self._features(sentence))
+            events.append(
+                {"event": "sentence", "side": side, "index": len(self._feats[side]) - 1, "text": sentence}
+            )
+        self._unrefreshed += len(fresh)
+        total = len(self._feats["A"]) + len(self._feats["B"])
+        if fresh and self._unrefreshed >= max(1.0, self.refresh_ratio * total):
+            self._unrefreshed = 0
+            events.extend(self._refresh())
+        return events
+
+    def _refresh(self) -> List[Dict]:
+        partial = _compare_features(
+            self._text["A"][: self._done["A"]],
+            self._text["B"][: self._done["B"]],
+            self._feats["A"],
+            self._feats["B"],
+            engine=self.engine,
+            similarity_mode="off",
+            hierarchical=self.hierarchical,
+            memo=self._memo,
+        )
+        matches = {(m["a_index"], m["b_index"]): m for m in partial["sentence_matches"]}
+        conflicts = {c["conflict_id"]: c for c in partial["conflicts"]}
+        events: List[Dict] = []
+        for key in self._matches.keys() - matches.keys():
+            events.append({"event": "match_retracted", "data": self._matches[key]})
+        for key in sorted(matches.keys() - self._matches.keys()):
+            events.append({"event": "match", "data": matches[key]})
+        for cid in self._conflicts.keys() - conflicts.keys():
+            events.append({"event": "conflict_retracted", "data": self._conflicts[cid]})
+        for cid, conflict in conflicts.items():
+            if cid not in self._conflicts:
+                events.append({"event": "conflict", "data": conflict})
+        self._matches = matches
+        self._conflicts = conflicts
+        return events
+
+    def finish(self, answer_a: Optional[str] = None, answer_b: Optional[str] = None) -> Dict:
+        """Diff of the full texts (or the given final answers), equal to compare_answers()."""
+        answer_a = self._text["A"] if answer_a is None else answer_a
+        answer_b = self._text["B"] if answer_b is None else answer_b
+        return _compare_features(
+            answer_a,
+            answer_b,
+            [self._features(s) for s in _split_sentences(answer_a)],
+            [self._features(s) for s in _split_sentences(answer_b)],
+            engine=self.engine,
+            similarity_mode=self.similarity_mode,
+            hierarchical=self.hierarchical,
+        )
@@ -1,6 +1,13 @@
+import asyncio
+import itertools
+import json
 import os
+import threading
 import time
-from typing import Dict
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 try:
     from dotenv import load_dotenv
@@ -8,7 +15,55 @@ except Exception:  # pragma: no cover - optional dependency fallback
     def load_dotenv():
         return None
 
+from .circuit_breaker import HALF_OPEN, OPEN, CircuitOpen, get_breaker, get_breaker_stats  # noqa: F401 - re-exported
 from .database import DatabaseManager
+from .divergence_detector import IncrementalComparator
+from .provider_clients import get_client
+from .provider_registry import ModelProvider, ProviderRegistry
+from .provider_scheduler import ProviderScheduler, get_scheduler
+from .single_flight import SingleFlight
+
+MODEL_NAMES = ["GPT", "Claude"]
+ANTHROPIC_MAX_TOKENS = 700
+
+# Identical (question, model, mode) requests in flight share one upstream call.
+_IN_FLIGHT = SingleFlight()
+
+# Under a latency budget a duplicate request is sent once the primary has been slower
+# than this quantile of the provider's recent latencies.
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+# Primaries run on their own thread so they never queue behind other calls (queueing
+# would look like slowness and trigger more hedges).  Hedges use this shared pool;
+# when all slots are busy a call is simply not hedged instead of waiting for one.
+HEDGE_SLOTS = 16
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=HEDGE_SLOTS, thread_name_prefix="model-hedge")
+_HEDGE_FREE = threading.BoundedSemaphore(HEDGE_SLOTS)
+_HEDGE_LOCK = threading.Lock()
+# hedged: duplicates sent; skipped: no free slot; *_wins: which attempt answered first;
+# cancelled: losers dropped before they started; abandoned: losers already in flight.
+_HEDGE_STATS = dict.fromkeys(("hedged", "skipped", "primary_wins", "hedge_wins", "cancelled", "abandoned"), 0)
+
+
+class LatencyBudgetExceeded(RuntimeError):
+    """Raised when no answer can be produced before the pipeline's latency deadline."""
+
+    provider_fault = False
+
+
+def get_hedge_stats() -> Dict[str, int]:
+    with _HEDGE_LOCK:
+        return dict(_HEDGE_STATS)
+
+
+def _count_hedge(key: str):
+    with _HEDGE_LOCK:
+        _HEDGE_STATS[key] += 1
+
+
+def get_coalescing_stats() -> Dict[str, int]:
+    """leaders = upstream calls made; coalesced = calls saved by waiting on a leader."""
+    return _IN_FLIGHT.stats()
 
 
 def _mock_answer(model_name: str, question: str) -> str:
@@ -25,9 +80,7 @@ def _mock_answer(model_name: str, question: str) -> str:
 
 
 def _call_openai(question: str) -> str:
-    from openai import OpenAI
-
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    client = get_client("openai", api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
     resp = client.responses.create(
         model=os.getenv("OPENAI_MODEL", "gpt-4.1-mini"),
         input=question,
@@ -37,12 +90,12 @@ def _call_openai(question: str) -> str:
 
 
 def _call_anthropic(question: str) -> str:
-    import anthropic
-
-    client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    client = get_client(
+        "anthropic", api_key=os.getenv("ANTHROPIC_API_KEY"), base_url=os.getenv("ANTHROPIC_BASE_URL")
+    )
     msg = client.messages.create(
         model=os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest"),
-        max_tokens=700,
+        max_tokens=ANTHROPIC_MAX_TOKENS,
         messages=[{"role": "user", "content": question}],
         timeout=30,
     )
@@ -54,7 +107,133 @@ def _call_anthropic(question: str) -> str:
     return "\n".join(parts).strip()
 
 
-def _retry_call(call_fn, retries: int = 2):
+def _stream_openai(question: str) -> Iterator[str]:
+    client = get_client("openai", api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
+    stream = client.responses.create(
+        model=os.getenv("OPENAI_MODEL", "gpt-4.1-mini"),
+        input=question,
+        timeout=30,
+        stream=True,
+    )
+    for event in stream:
+        if getattr(event, "type", "") == "response.output_text.delta":
+            yield event.delta
+
+
+def _stream_anthropic(question: str) -> Iterator[str]:
+    client = get_client(
+        "anthropic", api_key=os.getenv("ANTHROPIC_API_KEY"), base_url=os.getenv("ANTHROPIC_BASE_URL")
+    )
+    stream = client.messages.create(
+        model=os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-latest"),
+        max_tokens=ANTHROPIC_MAX_TOKENS,
+        messages=[{"role": "user", "content": question}],
+        timeout=30,
+        stream=True,
+    )
+    for event in stream:
+        if getattr(event, "type", "") == "content_block_delta":
+            text = getattr(event.delta, "text", "")
+            if text:
+                yield text
+
+
+def _stream_mock(model_name: str, question: str, chunk_size: int = 4) -> Iterator[str]:
+    answer = _mock_answer(model_name, question)
+    for start in range(0, len(answer), chunk_size):
+        yield answer[start : start + chunk_size]
+
+
+def _openai_compatible_call(model: str, base_url: str, api_key: Optional[str]) -> Callable[[str], str]:
+    def _call(question: str) -> str:
+        # Local servers (vLLM, llama.cpp, Ollama) implement chat completions, not the responses API.
+        client = get_client("openai", api_key=api_key or "not-needed", base_url=base_url)
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": question}],
+            timeout=30,
+        )
+        return (resp.choices[0].message.content or "").strip()
+
+    return _call
+
+
+# Built-ins resolve _call_*/_stream_* at call time so they can be patched on this module.
+PROVIDERS = ProviderRegistry()
+PROVIDERS.register(
+    ModelProvider(
+        "GPT",
+        "openai",
+        call=lambda question: _call_openai(question),
+        stream=lambda question: _stream_openai(question),
+        cost_per_1k_tokens=float(os.getenv("OPENAI_COST_PER_1K", "0.0016")),
+        default=True,
+    )
+)
+PROVIDERS.register(
+    ModelProvider(
+        "Claude",
+        "anthropic",
+        call=lambda question: _call_anthropic(question),
+        stream=lambda question: _stream_anthropic(question),
+        cost_per_1k_tokens=float(os.getenv("ANTHROPIC_COST_PER_1K", "0.015")),
+        default=True,
+    )
+)
+
+
+def register_openai_compatible(
+    name: str,
+    base_url: str,
+    model: str,
+    api_key: Optional[str] = None,
+    cost_per_1k_tokens: float = 0.0,
+) -> ModelProvider:
+    """Register a model served by an OpenAI-compatible endpoint, e.g. a local vLLM server."""
+    return PROVIDERS.register(
+        ModelProvider(
+            name,
+            f"openai-compatible:{base_url}",
+            call=_openai_compatible_call(model, base_url, api_key),
+            cost_per_1k_tokens=cost_per_1k_tokens,
+        )
+    )
+
+
+def register_env_providers():
+    # LOCAL_OPENAI_BASE_URL (+ LOCAL_OPENAI_MODEL, LOCAL_OPENAI_NAME) adds a local model.
+    base_url = os.getenv("LOCAL_OPENAI_BASE_URL")
+    name = os.getenv("LOCAL_OPENAI_NAME", "Local")
+    if base_url and name not in PROVIDERS:
+        register_openai_compatible(
+            name,
+            base_url,
+            os.getenv("LOCAL_OPENAI_MODEL", "local-model"),
+            api_key=os.getenv("LOCAL_OPENAI_API_KEY"),
+        )
+
+
+def get_provider_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-model call counts, failures, mean latency and estimated cost."""
+    return PROVIDERS.stats()
+
+
+def _resolve_models(models: Optional[Sequence[str]], policy: Optional[str]) -> List[str]:
+    if models is None:
+        return PROVIDERS.select(policy or "default")
+    for model_name in models:
+        PROVIDERS.get(model_name)
+    return list(models)
+
+
+def _estimate_tokens(question: str) -> int:
+    # Rough prompt size (~4 chars/token) plus the completion budget.
+    return len(question) // 4 + 1 + ANTHROPIC_MAX_TOKENS
+
+
+def _retry_call(call_fn, retries: int = 2, provider: Optional[str] = None, tokens: int = 0):
+    if provider is not None:
+        return get_scheduler(provider).run(call_fn, tokens=tokens, retries=retries)
     last_error = None
     for attempt in range(retries + 1):
         try:
@@ -66,6 +245,176 @@ def _retry_call(call_fn, retries: int = 2):
     raise last_error  # type: ignore[misc]
 
 
+def _hedge_delay(scheduler: ProviderScheduler, remaining: float) -> float:
+    learned = scheduler.latency_percentile(HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES)
+    if learned is None:
+        # No history yet: hedge halfway through the remaining budget.
+        return remaining / 2
+    return min(learned, remaining)
+
+
+def _start_thread(fn: Callable[[], str], name: str) -> "Future[str]":
+    future: "Future[str]" = Future()
+
+    def _run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_run, name=name, daemon=True).start()
+    return future
+
+
+def _submit_hedge(fn: Callable[[], str]) -> Optional["Future[str]"]:
+    if not _HEDGE_FREE.acquire(blocking=False):
+        _count_hedge("skipped")
+        return None
+    future = _HEDGE_POOL.submit(fn)
+    future.add_done_callback(lambda _: _HEDGE_FREE.release())
+    _count_hedge("hedged")
+    return future
+
+
+def _drop_losers(attempts: Dict["Future[str]", str]):
+    for loser in attempts:
+        # Not yet started attempts are cancelled; a running one cannot be interrupted,
+        # so it finishes in the background and its answer is discarded.
+        _count_hedge("cancelled" if loser.cancel() else "abandoned")
+
+
+def _hedged_call(model_name: str, call_fn: Callable[[], str], tokens: int, deadline: float) -> Tuple[str, str]:
+    """Race a primary and (if it is slow or fails) a hedged attempt; returns (answer, path)."""
+    provider = PROVIDERS.get(model_name).provider
+    scheduler = get_scheduler(provider)
+    breaker = get_breaker(provider)
+    remaining = deadline - time.monotonic()
+    typical = scheduler.latency_percentile(0.5, min_samples=HEDGE_MIN_SAMPLES)
+    if remaining <= 0 or (typical is not None and typical > remaining):
+        raise LatencyBudgetExceeded(f"{model_name}: typical latency exceeds the remaining budget.")
+
+    def _attempt() -> str:
+        def _call() -> str:
+            answer = scheduler.run(call_fn, tokens=tokens, retries=0, deadline=deadline)
+            if not answer:
+                raise RuntimeError(f"{model_name} returned empty response.")
+            return answer
+
+        return breaker.call(_call)
+
+    primary = _start_thread(_attempt, name=f"model-primary-{model_name}")
+    attempts = {primary: "primary"}
+    done, _ = wait([primary], timeout=_hedge_delay(scheduler, remaining))
+    if not done or primary.exception() is not None:
+        hedge = _submit_hedge(_attempt)
+        if hedge is not None:
+            attempts[hedge] = "hedge"
+
+    last_error: Optional[BaseException] = None
+    while attempts:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(list(attempts), timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            path = attempts.pop(future)
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+            _count_hedge(f"{path}_wins")
+            _drop_losers(attempts)
+            return future.result(), path
+    _drop_losers(attempts)
+    raise LatencyBudgetExceeded(f"{model_name}: no answer within the latency budget.") from last_error
+
+
+def _degraded_answer(
+    model_name: str,
+    question: str,
+    allow_mock_fallback: bool,
+    db: Optional[DatabaseManager],
+) -> Optional[Tuple[str, Optional[str], str]]:
+    """The last cached live answer, then mock if allowed; returns (answer, usage mode, path) or None."""
+    cached = db.get_cached_response(question, model_name, response_mode="live") if db is not None else None
+    if cached:
+        # Already stored for an earlier query; nothing new to persist.
+        return cached, None, "fallback_cache"
+    if allow_mock_fallback:
+        return _mock_answer(model_name, question), "fallback_mock", "fallback_mock"
+    return None
+
+
+def _invoke_live(
+    model_name: str,
+    question: str,
+    allow_mock_fallback: bool,
+    db: Optional[DatabaseManager] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[str, Optional[str], str]:
+    """Call one provider; returns (answer, usage mode to persist or None, serving path).
+
+    Without a deadline the call is retried by the provider scheduler.  With one it is
+    hedged, and a missed deadline falls back to a cached or mock answer.  While the
+    provider's circuit is open no call is made and the same fallback is served at once.
+    """
+    spec = PROVIDERS.get(model_name)
+    provider = spec.provider
+    breaker = get_breaker(provider)
+    tokens = _estimate_tokens(question)
+
+    def call_fn() -> str:
+        return spec.invoke(question, tokens=tokens)
+
+    if breaker.state == OPEN:
+        degraded = _degraded_answer(model_name, question, allow_mock_fallback, db)
+        if degraded is None:
+            raise CircuitOpen(
+                f"{model_name} circuit is open and no cached answer exists; "
+                "set --allow-mock-fallback to continue in degraded mode."
+            )
+        return degraded
+
+    if deadline is not None:
+        try:
+            answer, path = _hedged_call(model_name, call_fn, tokens, deadline)
+            return answer, "live", path
+        except Exception as e:
+            degraded = _degraded_answer(model_name, question, allow_mock_fallback, db)
+            if degraded is None:
+                raise LatencyBudgetExceeded(
+                    f"{model_name} could not answer within the latency budget and no cached answer exists; "
+                    "set --allow-mock-fallback to continue in degraded mode."
+                ) from e
+            return degraded
+
+    def _call() -> str:
+        # A half-open probe is a single attempt; retries would only delay re-opening.
+        retries = 0 if breaker.state == HALF_OPEN else 2
+        answer = _retry_call(call_fn, retries=retries, provider=provider, tokens=tokens)
+        if not answer:
+            raise RuntimeError(f"{model_name} returned empty response.")
+        return answer
+
+    try:
+        return breaker.call(_call), "live", "primary"
+    except CircuitOpen:
+        # Lost the race for the half-open probe slot.
+        degraded = _degraded_answer(model_name, question, allow_mock_fallback, db)
+        if degraded is None:
+            raise
+        return degraded
+    except Exception as e:
+        if allow_mock_fallback:
+            return _mock_answer(model_name, question), "fallback_mock", "fallback_mock"
+        raise RuntimeError(
+            f"{model_name} API call failed; set --allow-mock-fallback to continue in degraded mode."
+        ) from e
+
+
 def get_answers(
     question: str,
     db: DatabaseManager,
@@ -73,47 +422,353 @@ def get_answers(
     use_cache: bool = True,
     mock_mode: bool = False,
     allow_mock_fallback: bool = False,
+    latency_budget: Optional[float] = None,
+    trace: Optional[Dict[str, str]] = None,
+    models: Optional[Sequence[str]] = None,
+    policy: Optional[str] = None,
 ) -> Dict[str, str]:
+    """Return {model_name: answer} for the requested models, in order.
+
+    models names registered providers (PROVIDERS); by default the pair is picked by
+    policy ("default" = GPT and Claude, "fastest", "cheapest").
+
+    latency_budget (seconds) bounds the whole call: slow providers are hedged and,
+    when the deadline cannot be met, served from the cache or mock fallback.  If
+    trace is given it is filled with the path that served each model: cache, mock,
+    primary, hedge, coalesced, fallback_cache or fallback_mock.
+    """
     load_dotenv()
+    register_env_providers()
+    model_names = _resolve_models(models, policy)
+    deadline = time.monotonic() + latency_budget if latency_budget is not None else None
     result: Dict[str, str] = {}
+    paths: Dict[str, str] = {}
     cache_mode = "mock" if mock_mode else "live"
 
-    for model_name in ["GPT", "Claude"]:
-        cached = (
-            db.get_cached_response(question, model_name, response_mode=cache_mode)
-            if use_cache
-            else None
-        )
+    pending: List[str] = []
+    followers: Dict[str, Any] = {}
+    # Every model's cached answer comes back from one indexed query.
+    cached_answers = db.get_cached_answers(question, model_names, response_mode=cache_mode) if use_cache else {}
+    for model_name in model_names:
+        cached = cached_answers.get(model_name)
         if cached:
             result[model_name] = cached
-            continue
+            paths[model_name] = "cache"
+        elif use_cache:
+            leader, call = _IN_FLIGHT.acquire((question, model_name, cache_mode))
+            if leader:
+                pending.append(model_name)
+            else:
+                followers[model_name] = call
+        else:
+            pending.append(model_name)
+
+    if use_cache and pending:
+        # A leader that resolved between our cache read and acquire() has already
+        # persisted its answer: re-read before paying for another upstream call.
+        late = db.get_cached_answers(question, pending, response_mode=cache_mode)
+        for model_name in [m for m in pending if late.get(m)]:
+            pending.remove(model_name)
+            result[model_name] = late[model_name]
+            paths[model_name] = "cache"
+            _IN_FLIGHT.resolve((question, model_name, cache_mode), value=late[model_name])
 
-        answer_mode = cache_mode
+    outcomes: Dict[str, Tuple[str, Optional[str], str]] = {}
+    errors: Dict[str, Exception] = {}
+    try:
         if mock_mode:
-            answer = _mock_answer(model_name, question)
-        else:
-            try:
-                if model_name == "GPT":
-                    answer = _retry_call(lambda: _call_openai(question))
+            for model_name in pending:
+                outcomes[model_name] = (_mock_answer(model_name, question), cache_mode, "mock")
+        elif pending:
+            # Both providers are called concurrently; end-to-end latency is the slower one.
+            with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="model-invoker") as pool:
+                futures = {
+                    m: pool.submit(_invoke_live, m, question, allow_mock_fallback, db, deadline) for m in pending
+                }
+            for model_name, future in futures.items():
+                try:
+                    outcomes[model_name] = future.result()
+                except Exception as e:
+                    errors[model_name] = e
+
+        # Persist from this thread in model order so DB writes stay sequential and deterministic.
+        for model_name in pending:
+            if model_name not in outcomes:
+                continue
+            answer, answer_mode, paths[model_name] = outcomes[model_name]
+            if answer_mode is not None:
+                db.save_response(
+                    query_id=query_id,
+                    model_name=model_name,
+                    response_text=answer,
+                    usage_info=f"mode={answer_mode}",
+                )
+            result[model_name] = answer
+    finally:
+        # Release waiters only after persisting, so later requests hit the DB cache instead.
+        if use_cache:
+            for model_name in pending:
+                key = (question, model_name, cache_mode)
+                if model_name in result:
+                    _IN_FLIGHT.resolve(key, value=result[model_name])
                 else:
-                    answer = _retry_call(lambda: _call_anthropic(question))
-                if not answer:
-                    raise RuntimeError(f"{model_name} returned empty response.")
-            except Exception as e:
-                if allow_mock_fallback:
-                    answer = _mock_answer(model_name, question)
-                    answer_mode = "fallback_mock"
+                    _IN_FLIGHT.resolve(
+                        key, error=errors.get(model_name) or RuntimeError(f"{model_name} call was not completed.")
+                    )
+
+    for model_name in pending:
+        if model_name in errors:
+            raise errors[model_name]
+
+    # Coalesced answers are persisted once, by the leading request's query.
+    for model_name, call in followers.items():
+        if deadline is None:
+            result[model_name] = call.wait()
+            paths[model_name] = "coalesced"
+            continue
+        try:
+            result[model_name] = call.wait(timeout=max(0.0, deadline - time.monotonic()))
+            paths[model_name] = "coalesced"
+        except Exception as e:
+            degraded = _degraded_answer(model_name, question, allow_mock_fallback, db)
+            if degraded is None:
+                raise LatencyBudgetExceeded(
+                    f"{model_name} could not answer within the latency budget and no cached answer exists."
+                ) from e
+            answer, answer_mode, paths[model_name] = degraded
+            if answer_mode is not None:
+                db.save_response(
+                    query_id=query_id,
+                    model_name=model_name,
+                    response_text=answer,
+                    usage_info=f"mode={answer_mode}",
+                )
+            result[model_name] = answer
+
+    if trace is not None:
+        trace.update({m: paths[m] for m in model_names})
+    return {m: result[m] for m in model_names}
+
+
+def _read_checkpoint(path: str) -> Tuple[int, List[int]]:
+    """(number of input questions processed, indices among them that failed)."""
+    try:
+        state = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return 0, []
+    return int(state.get("completed", 0)), sorted(int(i) for i in state.get("failed", []))
+
+
+def _write_checkpoint(path: str, completed: int, failed: Iterable[int] = ()):
+    # Write-then-rename so a crash never leaves a truncated checkpoint behind.
+    target = Path(path)
+    tmp = target.with_name(target.name + ".tmp")
+    state = {"completed": completed, "failed": sorted(failed), "updated_at": time.time()}
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def get_answers_bulk(
+    questions: Iterable[str],
+    db: DatabaseManager,
+    use_cache: bool = True,
+    mock_mode: bool = False,
+    allow_mock_fallback: bool = False,
+    max_concurrency: int = 8,
+    batch_size: int = 200,
+    checkpoint_path: Optional[str] = None,
+    models: Optional[Sequence[str]] = None,
+    policy: Optional[str] = None,
+    batch_fn: Optional[Callable[[str, List[str]], List[str]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Answer many questions; yields {"index", "question", "answers", "cached", "error"} in input order.
+
+    Questions are processed batch_size at a time: the batch is deduplicated, looked up
+    in the cache with one query, the misses are dispatched with at most max_concurrency
+    provider calls in flight (or one batch_fn(model_name, questions) -> answers call per
+    model, e.g. a provider batch endpoint or local stand-in), and the new answers are
+    written in one transaction.  With checkpoint_path the number of processed input
+    questions and the indices of the failed ones are saved after every batch; a rerun
+    over the same iterable retries the failed questions first and skips the rest.
+    """
+    load_dotenv()
+    register_env_providers()
+    model_names = _resolve_models(models, policy)
+    cache_mode = "mock" if mock_mode else "live"
+    completed, retry = _read_checkpoint(checkpoint_path) if checkpoint_path else (0, [])
+    failed = set(retry)
+    stream = ((i, q) for i, q in enumerate(questions) if i >= completed or i in failed)
+
+    while True:
+        batch = list(itertools.islice(stream, batch_size))
+        if not batch:
+            break
+        unique = list(dict.fromkeys(q for _, q in batch))
+        known = db.get_cached_responses(unique, model_names, cache_mode) if use_cache else {}
+        misses = [(q, m) for q in unique for m in model_names if (q, m) not in known]
+
+        outcomes: Dict[Tuple[str, str], Tuple[str, Optional[str], str]] = {}
+        errors: Dict[str, str] = {}
+        if mock_mode:
+            for q, m in misses:
+                outcomes[(q, m)] = (_mock_answer(m, q), cache_mode, "mock")
+        elif batch_fn is not None:
+            for m in model_names:
+                pending = [q for q, model_name in misses if model_name == m]
+                if not pending:
+                    continue
+                try:
+                    answers = batch_fn(m, pending)
+                    if len(answers) != len(pending):
+                        raise RuntimeError(f"batch returned {len(answers)} answers for {len(pending)} questions.")
+                except Exception as e:
+                    for q in pending:
+                        errors.setdefault(q, f"{m}: {e}")
+                    continue
+                for q, answer in zip(pending, answers):
+                    outcomes[(q, m)] = (answer, "live", "batch")
+        elif misses:
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="bulk-invoker") as pool:
+                futures = {key: pool.submit(_invoke_live, key[1], key[0], allow_mock_fallback, db) for key in misses}
+            for (q, m), future in futures.items():
+                try:
+                    outcomes[(q, m)] = future.result()
+                except Exception as e:
+                    errors.setdefault(q, f"{m}: {e}")
+
+        # Only fully answered questions are stored, all in one transaction.
+        runs = []
+        for q in unique:
+            if q in errors:
+                continue
+            fresh = [
+                (m, outcomes[(q, m)][0], f"mode={outcomes[(q, m)][1]}")
+                for m in model_names
+                if (q, m) in outcomes and outcomes[(q, m)][1] is not None
+            ]
+            if fresh:
+                runs.append((q, fresh))
+        if runs:
+            db.save_responses_bulk(runs)
+
+        for index, q in batch:
+            if q in errors:
+                yield {"index": index, "question": q, "answers": None, "cached": [], "error": errors[q]}
+                continue
+            answers = {m: known[(q, m)] if (q, m) in known else outcomes[(q, m)][0] for m in model_names}
+            cached = [m for m in model_names if (q, m) in known]
+            yield {"index": index, "question": q, "answers": answers, "cached": cached, "error": None}
+        if checkpoint_path:
+            for index, q in batch:
+                if q in errors:
+                    failed.add(index)
                 else:
-                    raise RuntimeError(
-                        f"{model_name} API call failed; set --allow-mock-fallback to continue in degraded mode."
-                    ) from e
-
-        db.save_response(
-            query_id=query_id,
-            model_name=model_name,
-            response_text=answer,
-            usage_info=f"mode={answer_mode}",
-        )
-        result[model_name] = answer
+                    failed.discard(index)
+            completed = max(completed, batch[-1][0] + 1)
+            _write_checkpoint(checkpoint_path, completed, failed)
 
-    return result
+
+async def stream_divergence(
+    question: str,
+    mock_mode: bool = False,
+    allow_mock_fallback: bool = False,
+    db: Optional[DatabaseManager] = None,
+    query_id: Optional[int] = None,
+    models: Optional[Sequence[str]] = None,
+    policy: Optional[str] = None,
+) -> AsyncIterator[Dict]:
+    """Stream two models (see get_answers for models/policy) and yield divergence events while the answers are still arriving.
+
+    Events come from IncrementalComparator ("sentence", "match", "conflict", ...).  When
+    a stream fails and mock fallback is allowed, "error" and "reset" events are emitted
+    and the partial state is replayed from the degraded answer.
+    The last event is {"event": "final", "answers": {...}, "diff": ...}, where diff
+    equals compare_answers() on the completed answers.  With db and query_id the
+    answers are persisted like get_answers() does.
+    """
+    load_dotenv()
+    register_env_providers()
+    model_a, model_b = _resolve_models(models, policy)[:2]
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    sides = {model_a: "A", model_b: "B"}
+
+    def _post(item) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+            return True
+        except RuntimeError:
+            # The consumer is gone (loop closed); stop reading the provider stream.
+            return False
+
+    def _pump(model_name: str):
+        try:
+            if mock_mode:
+                chunks = _stream_mock(model_name, question)
+            else:
+                chunks = PROVIDERS.get(model_name).stream_chunks(question)
+            for chunk in chunks:
+                if not _post((model_name, "chunk", chunk)):
+                    return
+            _post((model_name, "done", None))
+        except Exception as e:
+            _post((model_name, "error", e))
+
+    for model_name in sides:
+        threading.Thread(target=_pump, args=(model_name,), name=f"stream-{model_name}", daemon=True).start()
+
+    comparator = IncrementalComparator()
+    modes = {m: "mock" if mock_mode else "live" for m in sides}
+    pending = set(sides)
+    held: deque = deque()
+    while pending:
+        model_name, kind, payload = held.popleft() if held else await queue.get()
+        side = sides[model_name]
+        if kind == "chunk":
+            # Chunks that queued up while the comparator was busy are fed in one go.
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item[0] != model_name or item[1] != "chunk":
+                    held.append(item)
+                    break
+                payload += item[2]
+            # Diffing is CPU-bound; keep it off the event loop so both streams keep flowing.
+            for event in await asyncio.to_thread(comparator.feed, side, payload):
+                yield event
+            continue
+        pending.discard(model_name)
+        if kind == "error":
+            if not allow_mock_fallback:
+                raise RuntimeError(
+                    f"{model_name} stream failed; set --allow-mock-fallback to continue in degraded mode."
+                ) from payload
+            modes[model_name] = "fallback_mock"
+            yield {"event": "error", "model": model_name, "error": str(payload)}
+            # Rebuild from the degraded answer; "reset" tells consumers to drop earlier partial state.
+            comparator, events = _replace_side(comparator, side, _mock_answer(model_name, question))
+            yield {"event": "reset", "model": model_name}
+            for event in events:
+                yield event
+
+    answers = {m: comparator.text(sides[m]).strip() for m in sides}
+    if db is not None and query_id is not None:
+        for model_name, answer in answers.items():
+            db.save_response(
+                query_id=query_id,
+                model_name=model_name,
+                response_text=answer,
+                usage_info=f"mode={modes[model_name]}",
+            )
+    yield {"event": "final", "answers": answers, "diff": comparator.finish(answers[model_a], answers[model_b])}
+
+
+def _replace_side(
+    comparator: IncrementalComparator, side: str, text: str
+) -> Tuple[IncrementalComparator, List[Dict]]:
+    fresh = IncrementalComparator(
+        comparator.engine, comparator.similarity_mode, comparator.hierarchical, comparator.refresh_ratio
+    )
+    other = "B" if side == "A" else "A"
+    events = fresh.feed(other, comparator.text(other))
+    events.extend(fresh.feed(side, text))
+    return fresh, events
@@ -0,0 +1,81 @@
+import atexit
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def _openai_factory(api_key: Optional[str], base_url: Optional[str]):
+    from openai import OpenAI
+
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+
+def _anthropic_factory(api_key: Optional[str], base_url: Optional[str]):
+    import anthropic
+
+    return anthropic.Anthropic(api_key=api_key, base_url=base_url)
+
+
+class ProviderClientRegistry:
+    """Process-wide SDK clients, created lazily once per (provider, api_key, base_url).
+
+    SDK clients own an HTTP connection pool, so reusing them keeps keep-alive and TLS
+    sessions across calls, retries and threads.  Point a provider at a local stand-in
+    server for load tests by passing its base_url (or setting OPENAI_BASE_URL /
+    ANTHROPIC_BASE_URL), or swap the constructor with register_factory().
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[Optional[str], Optional[str]], Any]] = {
+            "openai": _openai_factory,
+            "anthropic": _anthropic_factory,
+        }
+        self._clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+
+    def register_factory(self, provider: str, factory: Callable[[Optional[str], Optional[str]], Any]):
+        with self._lock:
+            self._factories[provider] = factory
+
+    def get(self, provider: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        key = (provider, api_key, base_url or None)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                factory = self._factories.get(provider)
+                if factory is None:
+                    raise ValueError(f"no client factory registered for provider {provider!r}.")
+                client = factory(api_key, base_url or None)
+                self._clients[key] = client
+            return client
+
+    def close_all(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            close = getattr(client, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+_REGISTRY = ProviderClientRegistry()
+atexit.register(_REGISTRY.close_all)
+
+
+def get_client(provider: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
+    return _REGISTRY.get(provider, api_key=api_key, base_url=base_url)
+
+
+def register_client_factory(provider: str, factory: Callable[[Optional[str], Optional[str]], Any]):
+    _REGISTRY.register_factory(provider, factory)
+
+
+def close_clients():
+    _REGISTRY.close_all()
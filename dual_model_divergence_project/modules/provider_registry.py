@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+SELECTION_POLICIES = ("default", "fastest", "cheapest")
+
+
+class ModelProvider:
+    """One answering backend: a name, a blocking call, optional streaming and a price.
+
+    `provider` keys the shared client pool, scheduler and circuit breaker, so several
+    models served by one endpoint share their limits.  invoke() / ainvoke() record
+    per-model latency and estimated cost (cost_per_1k_tokens * tokens / 1000).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        provider: str,
+        call: Callable[[str], str],
+        stream: Optional[Callable[[str], Iterator[str]]] = None,
+        cost_per_1k_tokens: float = 0.0,
+        default: bool = False,
+    ):
+        self.name = name
+        self.provider = provider
+        self.call = call
+        self.stream = stream
+        self.cost_per_1k_tokens = float(cost_per_1k_tokens)
+        self.default = default
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "latency_total": 0.0, "cost_total": 0.0}
+
+    def invoke(self, question: str, tokens: int = 0) -> str:
+        start = time.perf_counter()
+        try:
+            answer = self.call(question)
+        except Exception:
+            self._record(time.perf_counter() - start, 0, ok=False)
+            raise
+        self._record(time.perf_counter() - start, tokens, ok=True)
+        return answer
+
+    async def ainvoke(self, question: str, tokens: int = 0) -> str:
+        return await asyncio.to_thread(self.invoke, question, tokens)
+
+    def stream_chunks(self, question: str) -> Iterator[str]:
+        if self.stream is None:
+            # Non-streaming backends arrive as a single chunk.
+            yield self.invoke(question)
+            return
+        yield from self.stream(question)
+
+    def _record(self, latency: float, tokens: int, ok: bool):
+        with self._lock:
+            self._stats["calls"] += 1
+            if not ok:
+                self._stats["failures"] += 1
+                return
+            self._stats["latency_total"] += latency
+            self._stats["cost_total"] += tokens * self.cost_per_1k_tokens / 1000
+
+    def mean_latency(self) -> Optional[float]:
+        with self._lock:
+            ok = self._stats["calls"] - self._stats["failures"]
+            return self._stats["latency_total"] / ok if ok else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ok = self._stats["calls"] - self._stats["failures"]
+            return {
+                "provider": self.provider,
+                "calls": self._stats["calls"],
+                "failures": self._stats["failures"],
+                "mean_latency": round(self._stats["latency_total"] / ok, 4) if ok else None,
+                "cost_per_1k_tokens": self.cost_per_1k_tokens,
+                "estimated_cost": round(self._stats["cost_total"], 6),
+            }
+
+
+class ProviderRegistry:
+    """Ordered set of ModelProviders with a selection policy for the models to ask.
+
+    - default: the providers registered with default=True, in registration order.
+    - fastest: lowest mean observed latency; providers without history rank last.
+    - cheapest: lowest cost_per_1k_tokens.
+    Ties keep registration order.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[str, ModelProvider] = {}
+
+    def register(self, provider: ModelProvider) -> ModelProvider:
+        with self._lock:
+            self._providers[provider.name] = provider
+        return provider
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._providers.pop(name, None)
+
+    def get(self, name: str) -> ModelProvider:
+        with self._lock:
+            provider = self._providers.get(name)
+        if provider is None:
+            raise KeyError(f"unknown model provider: {name}")
+        return provider
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._providers)
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._providers
+
+    def select(self, policy: str = "default", count: int = 2) -> List[str]:
+        if policy not in SELECTION_POLICIES:
+            raise ValueError(f"policy must be one of {SELECTION_POLICIES}.")
+        with self._lock:
+            providers = list(self._providers.values())
+        if policy == "default":
+            chosen = [p for p in providers if p.default] or providers
+        elif policy == "fastest":
+            chosen = sorted(providers, key=lambda p: (p.mean_latency() is None, p.mean_latency() or 0.0))
+        else:
+            chosen = sorted(providers, key=lambda p: p.cost_per_1k_tokens)
+        if len(chosen) < count:
+            raise ValueError(f"policy {policy!r} needs {count} providers; {len(chosen)} registered.")
+        return [p.name for p in chosen[:count]]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = list(self._providers.values())
+        return {p.name: p.stats() for p in providers}
@@ -0,0 +1,254 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+class SchedulerRejected(RuntimeError):
+    """Raised when a request is refused admission (queue full or deadline unreachable)."""
+
+    # Refused locally, before reaching the provider: circuit breakers ignore it.
+    provider_fault = False
+
+
+def _is_throttle(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or getattr(error, "retry_after", None) is not None
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.level = self.capacity
+        self.updated: Optional[float] = None
+
+    def _refill(self, now: float):
+        if self.updated is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` (the level may go negative) and return seconds until it is covered."""
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class ProviderScheduler:
+    """Per-provider admission control: token buckets, AIMD concurrency and Retry-After.
+
+    Every limit is opt-in; a scheduler built with no options only honours Retry-After.
+    - requests_per_second / tokens_per_second: token buckets; callers wait for budget,
+      including before each retry.
+    - With max_concurrency set, the concurrency limit grows by 1/limit per fast success
+      and halves on a 429 (or shrinks by 10% when latency exceeds latency_target).
+    - A 429 with Retry-After pauses the whole provider until that time.
+    - With max_queue set, at most that many callers wait for admission.  A caller whose
+      deadline cannot be met is rejected up front with SchedulerRejected instead of queueing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: Optional[float] = None,
+        tokens_per_second: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        min_concurrency: int = 1,
+        initial_concurrency: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        latency_target: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Optional[Callable[[float], None]] = None,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_second) if requests_per_second else None
+        self.tokens = TokenBucket(tokens_per_second) if tokens_per_second else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        if max_concurrency is None:
+            self.limit = math.inf
+        else:
+            self.limit = float(initial_concurrency if initial_concurrency is not None else max_concurrency)
+        self.max_queue = max_queue
+        self.latency_target = latency_target
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._blocked_until = 0.0
+        self._latencies: Deque[float] = deque(maxlen=256)
+        self._stats = {"completed": 0, "failed": 0, "throttled": 0, "rejected": 0}
+
+    def _pause(self, seconds: float):
+        if seconds > 0:
+            (self._sleep or time.sleep)(seconds)
+
+    def _reserve(self, tokens: float, now: float, deadline: Optional[float]) -> float:
+        """Take rate budget for one call (lock held); return the wait before sending it."""
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1, now))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens, now))
+        if deadline is not None and now + wait > deadline:
+            if self.requests:
+                self.requests.refund(1)
+            if self.tokens and tokens:
+                self.tokens.refund(tokens)
+            self._stats["rejected"] += 1
+            raise SchedulerRejected(f"{self.name}: rate budget cannot be met before the deadline.")
+        return wait
+
+    def _admit(self, tokens: float, deadline: Optional[float]) -> float:
+        with self._cond:
+            if self.max_queue is not None and self._waiting >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise SchedulerRejected(f"{self.name}: admission queue is full.")
+            self._waiting += 1
+            try:
+                while True:
+                    now = self._clock()
+                    if deadline is not None and now >= deadline:
+                        self._stats["rejected"] += 1
+                        raise SchedulerRejected(f"{self.name}: deadline passed while queued.")
+                    if self._in_flight < max(self.min_concurrency, self.limit) and now >= self._blocked_until:
+                        break
+                    timeout = self._blocked_until - now if now < self._blocked_until else None
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - now) if timeout is not None else deadline - now
+                    self._cond.wait(timeout)
+
+                wait = self._reserve(tokens, now, deadline)
+                self._in_flight += 1
+                return wait
+            finally:
+                self._waiting -= 1
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float):
+        with self._cond:
+            self._stats["completed"] += 1
+            self._latencies.append(latency)
+            if self.max_concurrency is not None:
+                if self.latency_target is not None and latency > self.latency_target:
+                    self.limit = max(self.min_concurrency, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1.0 / max(1.0, self.limit))
+            self._cond.notify_all()
+
+    def _on_throttle(self, retry_after: Optional[float]):
+        with self._cond:
+            self._stats["throttled"] += 1
+            if self.max_concurrency is not None:
+                self.limit = max(self.min_concurrency, self.limit / 2.0)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, self._clock() + retry_after)
+
+    def run(
+        self,
+        call_fn: Callable[[], Any],
+        tokens: float = 0,
+        retries: int = 2,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """Run call_fn under this provider's limits, retrying failures with backoff or Retry-After."""
+        wait = self._admit(tokens, deadline)
+        try:
+            self._pause(wait)
+            for attempt in range(retries + 1):
+                start = self._clock()
+                try:
+                    result = call_fn()
+                except Exception as e:
+                    delay = 0.5 * (2**attempt)
+                    if _is_throttle(e):
+                        retry_after = _retry_after_seconds(e)
+                        self._on_throttle(retry_after)
+                        if retry_after is not None:
+                            delay = retry_after
+                    can_retry = (
+                        getattr(e, "retryable", True)
+                        and attempt < retries
+                        and (deadline is None or self._clock() + delay < deadline)
+                    )
+                    if not can_retry:
+                        with self._cond:
+                            self._stats["failed"] += 1
+                        raise
+                    # A retry is a new request: it pays the rate budget again.
+                    with self._cond:
+                        try:
+                            wait = self._reserve(tokens, self._clock(), deadline)
+                        except SchedulerRejected:
+                            # No budget left for a retry: surface the provider's own error.
+                            self._stats["failed"] += 1
+                            raise e
+                    self._pause(max(delay, wait))
+                    continue
+                self._on_success(self._clock() - start)
+                return result
+        finally:
+            self._release()
+
+    def latency_percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """q-quantile of recent successful call latencies, or None until min_samples are seen."""
+        with self._cond:
+            samples = sorted(self._latencies)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out: Dict[str, Any] = dict(self._stats)
+            out.update(
+                {
+                    "limit": round(self.limit, 3) if self.max_concurrency is not None else None,
+                    "in_flight": self._in_flight,
+                    "waiting": self._waiting,
+                    "blocked_for": max(0.0, round(self._blocked_until - self._clock(), 3)),
+                }
+            )
+        return out
+
+
+_SCHEDULERS: Dict[str, ProviderScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(provider)
+        if scheduler is None:
+            scheduler = _SCHEDULERS[provider] = ProviderScheduler(provider)
+        return scheduler
+
+
+def configure_scheduler(provider: str, **options: Any) -> ProviderScheduler:
+    """Replace the provider's scheduler, e.g. configure_scheduler("openai", requests_per_second=5)."""
+    scheduler = ProviderScheduler(provider, **options)
+    with _SCHEDULERS_LOCK:
+        _SCHEDULERS[provider] = scheduler
+    return scheduler
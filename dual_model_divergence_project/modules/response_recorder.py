@@ -0,0 +1,159 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .provider_registry import ProviderRegistry
+
+RECORDER_MODES = ("record", "replay")
+
+
+class ReplayMiss(KeyError):
+    """Raised in replay mode when no recording exists for (model, question)."""
+
+    # A miss is deterministic; the provider scheduler does not retry it.
+    retryable = False
+
+
+def _question_hash(question: str) -> str:
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()
+
+
+class ResponseRecorder:
+    """Record provider answers with their latency, or replay them without network access.
+
+    Recordings live in one SQLite file indexed by (model_name, question_hash).
+    In replay mode each call sleeps for the recorded latency times latency_scale
+    (0 replays instantly) and repeated questions cycle through their recordings.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency_scale: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if mode not in RECORDER_MODES:
+            raise ValueError(f"mode must be one of {RECORDER_MODES}.")
+        if latency_scale < 0:
+            raise ValueError("latency_scale must be >= 0.")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._cursor: Dict[Tuple[str, str], int] = {}
+        self._originals: Dict[str, Tuple[Callable, Optional[Callable]]] = {}
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if mode == "replay" and not Path(path).exists():
+            raise FileNotFoundError(f"replay file not found: {path}")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS recordings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model_name TEXT NOT NULL,
+                question_hash TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                latency_ms INTEGER NOT NULL,
+                recorded_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_recordings_lookup ON recordings (model_name, question_hash, id);
+            """
+        )
+
+    def record(self, model_name: str, question: str, answer: str, latency: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO recordings (model_name, question_hash, question, answer, latency_ms, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (model_name, _question_hash(question), question, answer, int(round(latency * 1000)), time.time()),
+            )
+            self._conn.commit()
+            self._stats["recorded"] += 1
+
+    def lookup(self, model_name: str, question: str) -> Tuple[str, float]:
+        """Next (answer, latency seconds) recorded for this model and question."""
+        key = (model_name, _question_hash(question))
+        with self._lock:
+            rows: List[Tuple[str, str, int]] = self._conn.execute(
+                "SELECT question, answer, latency_ms FROM recordings WHERE model_name = ? AND question_hash = ? "
+                "ORDER BY id",
+                key,
+            ).fetchall()
+            rows = [row for row in rows if row[0] == question]
+            if not rows:
+                self._stats["misses"] += 1
+                raise ReplayMiss(f"no recording for {model_name}: {question[:60]!r}")
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self._stats["replayed"] += 1
+        _, answer, latency_ms = rows[index % len(rows)]
+        return answer, latency_ms / 1000
+
+    def questions(self) -> List[str]:
+        """Recorded questions, in first-recorded order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT question FROM recordings GROUP BY question ORDER BY MIN(id)").fetchall()
+        return [row[0] for row in rows]
+
+    def wrap(self, model_name: str, call: Callable[[str], str]) -> Callable[[str], str]:
+        if self.mode == "record":
+
+            def _record(question: str) -> str:
+                start = time.perf_counter()
+                answer = call(question)
+                self.record(model_name, question, answer, time.perf_counter() - start)
+                return answer
+
+            return _record
+
+        def _replay(question: str) -> str:
+            answer, latency = self.lookup(model_name, question)
+            if latency and self.latency_scale:
+                self._sleep(latency * self.latency_scale)
+            return answer
+
+        return _replay
+
+    def install(self, registry: ProviderRegistry):
+        """Route every registered provider's calls through this recorder."""
+        for name in registry.names():
+            provider = registry.get(name)
+            if name in self._originals:
+                continue
+            self._originals[name] = (provider.call, provider.stream)
+            provider.call = self.wrap(name, provider.call)
+            # Streams arrive as one chunk while recording or replaying whole answers.
+            provider.stream = None
+
+    def uninstall(self, registry: ProviderRegistry):
+        for name, (call, stream) in self._originals.items():
+            if name in registry:
+                provider = registry.get(name)
+                provider.call, provider.stream = call, stream
+        self._originals.clear()
+
+    @contextmanager
+    def installed(self, registry: ProviderRegistry) -> Iterator["ResponseRecorder"]:
+        self.install(registry)
+        try:
+            yield self
+        finally:
+            self.uninstall(registry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out["recordings"] = self._conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+        return out
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,71 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        if not self.done.wait(timeout):
+            raise TimeoutError("in-flight call did not finish within the timeout.")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one in-flight execution.
+
+    acquire() makes the first caller the leader; later callers for the same key get
+    the leader's _Call and wait() on it.  The leader must resolve() the key, and can
+    do so after persisting its result, so no window opens between "upstream call
+    finished" and "answer is visible in the cache".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    def acquire(self, key: Hashable) -> Tuple[bool, _Call]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                return False, call
+            call = self._calls[key] = _Call()
+            self._stats["leaders"] += 1
+            return True, call
+
+    def resolve(self, key: Hashable, value: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            call = self._calls.pop(key, None)
+        if call is None:
+            return
+        call.value = value
+        call.error = error
+        call.done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per concurrent key; returns (result, shared)."""
+        leader, call = self.acquire(key)
+        if not leader:
+            return call.wait(), True
+        try:
+            value = fn()
+        except BaseException as e:
+            self.resolve(key, error=e)
+            raise
+        self.resolve(key, value=value)
+        return value, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out["in_flight"] = len(self._calls)
+        return out
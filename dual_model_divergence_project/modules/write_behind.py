@@ -0,0 +1,331 @@
+import atexit
+import itertools
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .database import DatabaseManager, UnitOfWork, question_hash
+
+BACKPRESSURE_POLICIES = ("block", "inline", "reject")
+# buffered: return once queued; committed: wait for the batch commit (group commit);
+# synced: committed, with synchronous=FULL on the writer connection.
+DURABILITY_LEVELS = ("buffered", "committed", "synced")
+
+_STOP = object()
+
+
+class WriteBehindFull(RuntimeError):
+    """Raised when the write queue is full and the backpressure policy refuses to wait."""
+
+
+class _Job:
+    __slots__ = ("unit", "overlay_keys", "done", "error")
+
+    def __init__(self, unit: UnitOfWork):
+        self.unit = unit
+        self.overlay_keys: List[Tuple[Tuple[str, str, Optional[str]], int]] = []
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class _QueuedUnit(UnitOfWork):
+    def __init__(self, store: "WriteBehindDatabase"):
+        super().__init__(store.db)
+        self._store = store
+
+    def get_cached_response(self, *args, **kwargs) -> Optional[str]:
+        return self._store.get_cached_response(*args, **kwargs)
+
+    def get_cached_answers(self, *args, **kwargs) -> Dict[str, str]:
+        return self._store.get_cached_answers(*args, **kwargs)
+
+    def get_cached_responses(self, *args, **kwargs) -> Dict[Tuple[str, str], str]:
+        return self._store.get_cached_responses(*args, **kwargs)
+
+    def commit(self):
+        if not self.is_empty():
+            self._store.submit(self.detach())
+
+
+class WriteBehindDatabase:
+    """Move DatabaseManager writes off the request path onto one writer thread.
+
+    Units of work are queued (at most max_queue) and committed by the writer in
+    batches of up to batch_size units per transaction; a batch that fails is retried
+    unit by unit so one bad run does not drop the others.  Answers are visible to the
+    cache read methods through an in-memory overlay until their batch has committed.
+    save_query() stays synchronous because callers need the real id.  close() (also
+    registered with atexit) flushes the queue and stops the writer.
+    """
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        max_queue: int = 1024,
+        batch_size: int = 64,
+        backpressure: str = "block",
+        durability: str = "buffered",
+        block_timeout: Optional[float] = 30.0,
+    ):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"backpressure must be one of {BACKPRESSURE_POLICIES}.")
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {DURABILITY_LEVELS}.")
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.backpressure = backpressure
+        self.durability = durability
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._overlay: Dict[Tuple[str, str, Optional[str]], Tuple[int, str]] = {}
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "failed": 0, "inline": 0, "rejected": 0}
+        self.last_error: Optional[BaseException] = None
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # -- reads -----------------------------------------------------------------
+
+    def _overlay_answer(self, digest: str, model_name: str, response_mode: Optional[str]) -> Optional[str]:
+        with self._lock:
+            if response_mode:
+                hit = self._overlay.get((digest, model_name, response_mode))
+            else:
+                hits = [v for (d, m, _), v in self._overlay.items() if d == digest and m == model_name]
+                hit = max(hits) if hits else None
+        return hit[1] if hit else None
+
+    def get_cached_answers(
+        self,
+        question_text: str,
+        model_names: Sequence[str],
+        response_mode: Optional[str] = None,
+    ) -> Dict[str, str]:
+        digest = question_hash(question_text)
+        found = {}
+        for model_name in model_names:
+            answer = self._overlay_answer(digest, model_name, response_mode)
+            if answer is not None:
+                found[model_name] = answer
+        missing = [m for m in model_names if m not in found]
+        if missing:
+            found.update(self.db.get_cached_answers(question_text, missing, response_mode))
+        return {m: found[m] for m in model_names if m in found}
+
+    def get_cached_response(
+        self,
+        question_text: str,
+        model_name: str,
+        response_mode: Optional[str] = None,
+    ) -> Optional[str]:
+        return self.get_cached_answers(question_text, [model_name], response_mode).get(model_name)
+
+    def get_cached_responses(
+        self,
+        questions: Sequence[str],
+        model_names: Sequence[str],
+        response_mode: str,
+    ) -> Dict[Tuple[str, str], str]:
+        out = self.db.get_cached_responses(questions, model_names, response_mode)
+        for question in questions:
+            digest = question_hash(question)
+            for model_name in model_names:
+                answer = self._overlay_answer(digest, model_name, response_mode)
+                if answer is not None:
+                    out[(question, model_name)] = answer
+        return out
+
+    # -- writes ----------------------------------------------------------------
+
+    def init_db(self):
+        self.db.init_db()
+
+    def save_query(self, question_text: str) -> int:
+        return self.db.save_query(question_text)
+
+    def _single(self, method: str, *args, **kwargs):
+        unit = UnitOfWork(self.db)
+        getattr(unit, method)(*args, **kwargs)
+        self.submit(unit)
+
+    def save_response(self, *args, **kwargs):
+        self._single("save_response", *args, **kwargs)
+
+    def save_divergence(self, *args, **kwargs):
+        self._single("save_divergence", *args, **kwargs)
+
+    def save_structure(self, *args, **kwargs):
+        self._single("save_structure", *args, **kwargs)
+
+    def save_fused_answer(self, *args, **kwargs):
+        self._single("save_fused_answer", *args, **kwargs)
+
+    def save_evidence(self, *args, **kwargs):
+        self._single("save_evidence", *args, **kwargs)
+
+    @contextmanager
+    def unit_of_work(self, commit_on_error: bool = False):
+        """Like DatabaseManager.unit_of_work(), but the unit is queued instead of committed."""
+        unit = _QueuedUnit(self)
+        try:
+            yield unit
+        except BaseException:
+            if commit_on_error:
+                unit.commit()
+            raise
+        unit.commit()
+
+    def _overlay_keys(self, unit: UnitOfWork) -> List[Tuple[str, str, Optional[str]]]:
+        keys = []
+        for question_text, query_id, model_name, text, usage_info in unit.pending_responses():
+            if question_text is None:
+                with self.db._read() as conn:
+                    row = conn.execute("SELECT question_text FROM queries WHERE id = ?", (query_id,)).fetchone()
+                if row is None:
+                    continue
+                question_text = row[0]
+            mode = usage_info[len("mode="):] if usage_info.startswith("mode=") else None
+            keys.append(((question_hash(question_text), model_name, mode), text))
+        return keys
+
+    def submit(self, unit: UnitOfWork):
+        """Queue a unit of work according to the backpressure and durability settings."""
+        if self._closed:
+            raise RuntimeError("write-behind store is closed.")
+        job = _Job(unit)
+        entries = self._overlay_keys(unit)
+        with self._lock:
+            for key, text in entries:
+                seq = next(self._seq)
+                self._overlay[key] = (seq, text)
+                job.overlay_keys.append((key, seq))
+        try:
+            if self.backpressure == "block":
+                self._queue.put(job, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(job)
+        except queue.Full:
+            if self.backpressure == "inline":
+                # Write on the caller's thread instead of waiting for queue space.
+                try:
+                    with self.db._connect() as conn:
+                        unit.write(conn)
+                finally:
+                    unit.release()
+                    self._drop_overlay(job)
+                with self._lock:
+                    self._stats["inline"] += 1
+                return
+            unit.release()
+            self._drop_overlay(job)
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise WriteBehindFull(f"write-behind queue is full ({self._queue.maxsize} units).") from None
+        with self._lock:
+            self._stats["queued"] += 1
+        if self.durability != "buffered":
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+
+    def _drop_overlay(self, job: _Job):
+        with self._lock:
+            for key, seq in job.overlay_keys:
+                current = self._overlay.get(key)
+                if current is not None and current[0] == seq:
+                    del self._overlay[key]
+
+    # -- writer thread -----------------------------------------------------------
+
+    def _run(self):
+        conn = self.db._open()
+        conn.execute(f"PRAGMA synchronous = {'FULL' if self.durability == 'synced' else 'NORMAL'}")
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    self._queue.task_done()
+                    return
+                batch = [item]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._write_batch(conn, batch)
+                if stop:
+                    self._queue.task_done()
+                    return
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch: List[_Job]):
+        try:
+            try:
+                with conn:
+                    for job in batch:
+                        job.unit.write(conn)
+            except Exception:
+                # Isolate the failing unit(s); the rest of the batch is still stored.
+                for job in batch:
+                    try:
+                        with conn:
+                            job.unit.write(conn)
+                    except Exception as e:
+                        job.error = e
+            with self._lock:
+                self._stats["batches"] += 1
+                for job in batch:
+                    if job.error is None:
+                        self._stats["written"] += 1
+                    else:
+                        self._stats["failed"] += 1
+                        self.last_error = job.error
+        finally:
+            for job in batch:
+                job.unit.release()
+                self._drop_overlay(job)
+                job.done.set()
+                self._queue.task_done()
+
+    # -- lifecycle ---------------------------------------------------------------
+
+    def flush(self):
+        """Block until every unit queued so far has been written (or has failed)."""
+        self._queue.join()
+
+    def close(self):
+        """Flush the queue and stop the writer; later writes raise."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["overlay"] = len(self._overlay)
+        out["queue_depth"] = self._queue.qsize()
+        return out
+
+    def __enter__(self) -> "WriteBehindDatabase":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name: str):
+        # Anything not intercepted (bulk writes, _connect, ...) goes straight to the database.
+        return getattr(self.db, name)
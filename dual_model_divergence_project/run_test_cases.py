@@ -6,6 +6,9 @@ CASES = [
     ["python", "-m", "unittest", "tests.test_basic_flow", "-v"],
     ["python", "-m", "unittest", "tests.test_stage2_cases_unittest", "-v"],
     ["python", "-m", "unittest", "tests.test_stage3_realworld_benchmark_unittest", "-v"],
+    ["python", "-m", "unittest", "tests.test_stage4_performance_unittest", "-v"],
+    ["python", "-m", "unittest", "tests.test_stage5_invoker_unittest", "-v"],
+    ["python", "-m", "unittest", "tests.test_stage6_database_unittest", "-v"],
     ["python", "experiments/run_benchmark.py"],
     ["python", "experiments/run_realworld_benchmark.py"],
 ]
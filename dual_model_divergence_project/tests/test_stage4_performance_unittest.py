@@ -0,0 +1,304 @@
+import random
+import re
+import unittest
+from unittest import mock
+
+from modules import divergence_detector
+from modules.compare_cache import CompareCache
+from modules.divergence_detector import compare_answers, compare_many
+
+
+class Stage4DetectorPerformanceTests(unittest.TestCase):
+    def test_sentence_features_are_built_once_per_sentence(self):
+        a = "。".join(f"第{i}条结论不成立" for i in range(6))
+        b = "。".join(f"第{i}条结论成立" for i in range(5))
+        with mock.patch(
+            "modules.divergence_detector._sentence_features",
+            wraps=divergence_detector._sentence_features,
+        ) as spy:
+            compare_answers(a, b)
+        self.assertEqual(spy.call_count, 11)
+
+    def test_sentence_features_fields(self):
+        feat = divergence_detector._sentence_features("该方案不能在2020年离线执行。")
+        self.assertTrue(feat.negated)
+        self.assertEqual(feat.years, frozenset({"2020"}))
+        self.assertEqual(feat.normalized, "该方案不能在2020年离线执行")
+        self.assertEqual(feat.core, "该方案在2020年离线执行")
+        self.assertIn("离线", feat.ngrams)
+
+    def test_candidate_pairs_keep_every_pair_above_threshold(self):
+        rng = random.Random(7)
+        alphabet = "ab不是年2a ,。"
+
+        def _sentences():
+            return [
+                "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+                for _ in range(rng.randint(0, 6))
+            ]
+
+        for _ in range(300):
+            a_feats = divergence_detector._build_features(_sentences())
+            b_feats = divergence_detector._build_features(_sentences())
+            kept = {(i, j) for i, j, _ in divergence_detector._candidate_pairs(a_feats, b_feats)}
+            for i, fa in enumerate(a_feats):
+                for j, fb in enumerate(b_feats):
+                    score = (
+                        divergence_detector.MATCH_W1 * divergence_detector._semantic_similarity_features(fa, fb)
+                        + divergence_detector.MATCH_W2 * divergence_detector._rule_similarity_features(fa, fb)
+                        + divergence_detector.MATCH_W3
+                        * divergence_detector._position_score(i, j, len(a_feats), len(b_feats))
+                    )
+                    if score >= divergence_detector.MATCH_THRESHOLD:
+                        self.assertIn((i, j), kept, msg=f"{fa.text!r} vs {fb.text!r}")
+
+    def test_candidate_pairs_skip_unrelated_sentences(self):
+        a_feats = divergence_detector._build_features(["木星是太阳系最大的行星", "该方案可离线执行"])
+        b_feats = divergence_detector._build_features(["专利申请于2020年提交", "该方案可以离线执行"])
+        kept = [(i, j) for i, j, _ in divergence_detector._candidate_pairs(a_feats, b_feats)]
+        self.assertEqual(kept, [(1, 1)])
+
+    def test_bounded_ratio_agrees_with_sequence_matcher(self):
+        import difflib
+
+        rng = random.Random(3)
+        divergence_detector.reset_ratio_stats()
+        for _ in range(500):
+            a = "".join(rng.choice("abcab") for _ in range(rng.randint(0, 12)))
+            b = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 12)))
+            cutoff = rng.choice([0.5, 0.72, 0.82])
+            exact = difflib.SequenceMatcher(a=a, b=b).ratio()
+            bounded = divergence_detector._bounded_ratio(a, b, cutoff)
+            if exact >= cutoff:
+                self.assertEqual(bounded, exact)
+            else:
+                self.assertIsNone(bounded)
+        stats = divergence_detector.get_ratio_stats()
+        self.assertEqual(stats["calls"], 500)
+        self.assertEqual(
+            stats["length_reject"] + stats["quick_reject"] + stats["exact_reject"] + stats["exact_pass"],
+            500,
+        )
+        self.assertGreater(stats["length_reject"], 0)
+
+    def test_negation_scan_returns_flag_and_core_in_one_pass(self):
+        self.assertEqual(divergence_detector._negation_scan("It is NOT safe."), (True, "itissafe"))
+        self.assertEqual(divergence_detector._negation_scan("该系统在不断进化"), (False, "该系统在不断进化"))
+
+    def test_runtime_negation_lexicon_extension(self):
+        original = list(divergence_detector.NEGATION_PATTERNS)
+        try:
+            self.assertFalse(divergence_detector._has_negation("该说法绝非事实"))
+            divergence_detector.register_negation_patterns(r"绝非")
+            self.assertTrue(divergence_detector._has_negation("该说法绝非事实"))
+            self.assertEqual(divergence_detector._strip_negation("该说法绝非事实"), "该说法事实")
+            with self.assertRaises(Exception):
+                divergence_detector.register_negation_patterns(r"(")
+        finally:
+            divergence_detector.NEGATION_PATTERNS[:] = original
+        self.assertFalse(divergence_detector._has_negation("该说法绝非事实"))
+
+    def test_year_claims_respect_pattern_priority(self):
+        sentences = ["OpenAI application was filed in 2023，X技术专利申请于2020年", "无关句子2020年"]
+        claims = divergence_detector._extract_year_claims(sentences)
+        self.assertEqual(
+            claims,
+            [
+                {
+                    "subject": "X技术",
+                    "year": "2020",
+                    "sentence": sentences[0],
+                    "sentence_index": 0,
+                }
+            ],
+        )
+
+    def test_registered_claim_kind_is_extracted(self):
+        original = list(divergence_detector.CLAIM_PATTERNS)
+        try:
+            divergence_detector.register_claim_pattern(
+                divergence_detector.ClaimPattern(
+                    name="en_version_release",
+                    kind="version",
+                    regex=r"(?P<subject>[A-Za-z0-9_-]{1,40})\s+version\s+(?P<version>\d+(?:\.\d+)*)",
+                    value_group="version",
+                    keywords=("version",),
+                    flags=re.I,
+                )
+            )
+            claims = divergence_detector._extract_claims("version", [(0, "Python Version 3.11 ships today")])
+            self.assertEqual(claims[0]["subject"], "Python")
+            self.assertEqual(claims[0]["version"], "3.11")
+            with self.assertRaises(ValueError):
+                divergence_detector.register_claim_pattern(
+                    divergence_detector.ClaimPattern(name="bad", kind="version", regex=r"v(\d+)", value_group="v")
+                )
+        finally:
+            divergence_detector.CLAIM_PATTERNS[:] = original
+
+    @unittest.skipIf(divergence_detector.np is None, "numpy is not installed")
+    def test_numpy_engine_matches_python_engine(self):
+        rng = random.Random(11)
+        fragments = [
+            "太阳系中最大的行星是木星",
+            "X技术专利申请于2020年",
+            "X技术专利申请于2018年",
+            "该方案可离线执行",
+            "该方案不可离线执行",
+            "Autodesk patent filed in 2025",
+            "It does not verify outputs",
+            "It verifies and cites language model outputs",
+            "木星是气态巨行星",
+            "无需联网",
+            ",",
+        ]
+        for _ in range(120):
+            a = "。".join(rng.choice(fragments) for _ in range(rng.randint(0, 10)))
+            b = "\n".join(rng.choice(fragments) for _ in range(rng.randint(0, 10)))
+            self.assertEqual(compare_answers(a, b, engine="numpy"), compare_answers(a, b))
+
+    def test_compare_many_preserves_order_across_processes(self):
+        pairs = [
+            ("X技术专利申请于2020年。", "X技术专利申请于2018年。"),
+            ("该方案可离线执行。", "该方案不可离线执行。"),
+            ("太阳系中最大的行星是木星。", "太阳系最大的行星是木星"),
+        ] * 5
+        stream = compare_many(iter(pairs), workers=2, chunksize=2)
+        self.assertEqual(list(stream), [compare_answers(a, b) for a, b in pairs])
+        self.assertEqual(list(compare_many([], workers=2)), [])
+
+    def test_approx_similarity_is_upper_bound_of_exact(self):
+        import difflib
+
+        rng = random.Random(5)
+        for _ in range(300):
+            a = "".join(rng.choice("木星土星abc。") for _ in range(rng.randint(0, 40)))
+            b = "".join(rng.choice("木星地球abd。") for _ in range(rng.randint(0, 40)))
+            exact = difflib.SequenceMatcher(a=a, b=b).ratio()
+            approx = divergence_detector._document_similarity(a, b, "approx")
+            self.assertLessEqual(exact, approx + 1e-12)
+            self.assertLessEqual(approx, 1.0)
+
+    def test_similarity_off_round_trips_through_database(self):
+        import json
+        import tempfile
+        from pathlib import Path
+
+        from modules.database import DatabaseManager
+
+        diff = compare_answers("木星最大。", "土星很大。", similarity_mode="off")
+        self.assertIsNone(diff["similarity_ratio"])
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(str(Path(tmp) / "sim.db"))
+            db.init_db()
+            qid = db.save_query("q")
+            db.save_divergence(qid, diff["summary"], json.dumps(diff, ensure_ascii=False))
+            with db._connect() as conn:
+                row = conn.execute("SELECT diff_detail FROM divergences").fetchone()
+        self.assertEqual(json.loads(row[0]), diff)
+
+    def test_compare_cache_hits_evicts_and_invalidates_on_config_change(self):
+        cache = CompareCache(max_entries=2)
+        first = cache.compare("X技术专利申请于2020年。", "X技术专利申请于2018年。")
+        first["conflicts"].clear()
+        again = cache.compare("X技术专利申请于2020年。", "X技术专利申请于2018年。")
+        self.assertTrue(again["conflicts"], "cached results must not share state with callers")
+        cache.compare("a", "b")
+        cache.compare("c", "d")
+        self.assertEqual(cache.stats(), {"hits": 1, "disk_hits": 0, "misses": 3, "evictions": 1, "disk_evictions": 0, "entries": 2})
+
+        with mock.patch.object(divergence_detector, "MATCH_THRESHOLD", 0.99):
+            cache.compare("c", "d")
+        self.assertEqual(cache.stats()["misses"], 4)
+        original = list(divergence_detector.NEGATION_PATTERNS)
+        try:
+            divergence_detector.register_negation_patterns("绝非")
+            cache.compare("c", "d")
+        finally:
+            divergence_detector.NEGATION_PATTERNS[:] = original
+        self.assertEqual(cache.stats()["misses"], 5)
+
+    def test_compare_cache_disk_tier_survives_restart(self):
+        import tempfile
+        from pathlib import Path
+
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = str(Path(tmp) / "compare_cache.db")
+            expected = CompareCache(disk_path=disk).compare("该方案可离线执行。", "该方案不可离线执行。")
+            restarted = CompareCache(disk_path=disk)
+            self.assertEqual(restarted.compare("该方案可离线执行。", "该方案不可离线执行。"), expected)
+            self.assertEqual(restarted.stats()["disk_hits"], 1)
+            self.assertEqual(restarted.stats()["misses"], 0)
+
+    def test_compare_cache_disk_tier_is_bounded_and_expires(self):
+        import sqlite3
+        import tempfile
+        from pathlib import Path
+
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = str(Path(tmp) / "compare_cache.db")
+            cache = CompareCache(max_entries=0, disk_path=disk, max_disk_entries=3)
+            for i in range(5):
+                cache.compare(f"a{i}", f"b{i}")
+            with sqlite3.connect(disk) as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM compare_cache").fetchone()[0], 3)
+            self.assertEqual(cache.stats()["disk_evictions"], 2)
+            cache.compare("a4", "b4")
+            cache.compare("a0", "b0")  # pruned: recomputed
+            self.assertEqual((cache.stats()["disk_hits"], cache.stats()["misses"]), (1, 6))
+
+            expiring = CompareCache(max_entries=0, disk_path=disk, disk_ttl=60)
+            with sqlite3.connect(disk) as conn:
+                conn.execute("UPDATE compare_cache SET created_at = datetime('now', '-2 minutes')")
+            expiring.compare("a4", "b4")
+            self.assertEqual(expiring.stats()["misses"], 1)
+            with sqlite3.connect(disk) as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM compare_cache").fetchone()[0], 1)
+
+    def test_incremental_comparator_scores_each_pair_once(self):
+        rng = random.Random(11)
+        fragments = ["X技术专利申请于2020年", "该方案可离线执行", "该方案不可离线执行", "木星最大", "模型给出了证据"]
+        a = [f"{rng.choice(fragments)}第{i}项" for i in range(40)]
+        b = [f"{rng.choice(fragments)}第{i}项" for i in range(40)]
+        comparator = divergence_detector.IncrementalComparator(refresh_ratio=0)
+        divergence_detector.reset_ratio_stats()
+        for sa, sb in zip(a, b):
+            comparator.feed("A", sa + "。")
+            comparator.feed("B", sb + "。")
+        # At most one semantic and one negation-core ratio per pair across all 80 refreshes.
+        self.assertLessEqual(divergence_detector.get_ratio_stats()["calls"], 2 * 40 * 40)
+        self.assertEqual(comparator.finish(), compare_answers("。".join(a) + "。", "。".join(b) + "。"))
+
+        throttled = divergence_detector.IncrementalComparator()
+        with mock.patch.object(throttled, "_refresh", wraps=throttled._refresh) as refresh:
+            for sa, sb in zip(a * 5, b * 5):
+                throttled.feed("A", sa + "。")
+                throttled.feed("B", sb + "。")
+        self.assertLess(refresh.call_count, 100)  # 400 sentences, refreshed on 5% growth
+
+    def test_hierarchical_mode_skips_pairs_and_keeps_local_matches(self):
+        paragraphs = [[f"第{p}节第{k}条结论成立{p * 10 + k}" for k in range(6)] for p in range(30)]
+        a = "\n\n".join("。".join(p) for p in paragraphs)
+        b = "\n\n".join("。".join(p) for p in paragraphs)
+        with mock.patch.object(divergence_detector, "HIERARCHICAL_MIN_SENTENCES", 100):
+            auto = compare_answers(a, b)
+        flat = compare_answers(a, b, hierarchical=False)
+        self.assertEqual(auto["match_stats"]["mode"], "hierarchical")
+        self.assertEqual(flat["match_stats"]["mode"], "flat")
+        self.assertEqual(auto["match_stats"]["pair_space"], 180 * 180)
+        self.assertGreater(auto["match_stats"]["skipped_ratio"], 0.8)
+        self.assertEqual(auto["sentence_matches"], flat["sentence_matches"])
+
+    def test_sentence_blocks_cover_split_sentences(self):
+        text = "甲。乙\n\n丙！丁？戊\n己\n \n庚。"
+        blocks = divergence_detector._sentence_blocks(text, block_size=2)
+        self.assertEqual([list(b) for b in blocks], [[0, 1], [2, 3], [4, 5], [6]])
+        self.assertEqual(sum(len(b) for b in blocks), len(divergence_detector._split_sentences(text)))
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compare_answers("a", "b", engine="gpu")
+
+
+if __name__ == "__main__":
+    unittest.main()
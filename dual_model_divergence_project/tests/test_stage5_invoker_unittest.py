@@ -0,0 +1,687 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules import (
+    circuit_breaker,
+    model_invoker,
+    provider_clients,
+    provider_registry,
+    provider_scheduler,
+    response_recorder,
+)
+from modules.database import DatabaseManager
+from modules.divergence_detector import IncrementalComparator, compare_answers
+from modules.model_invoker import _call_openai, get_answers, stream_divergence
+
+
+class Stage5InvokerTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(str(Path(self._tmp.name) / "invoker.db"))
+        self.db.init_db()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _responses(self):
+        with self.db._connect() as conn:
+            return conn.execute("SELECT model_name, response_text, usage_info FROM model_responses ORDER BY id").fetchall()
+
+    def test_providers_are_called_concurrently(self):
+        barrier = threading.Barrier(2, timeout=2)
+
+        def _slow(answer):
+            def _call(question):
+                barrier.wait()
+                time.sleep(0.2)
+                return answer
+
+            return _call
+
+        qid = self.db.save_query("q")
+        with mock.patch("modules.model_invoker._call_openai", side_effect=_slow("A")), mock.patch(
+            "modules.model_invoker._call_anthropic", side_effect=_slow("B")
+        ):
+            start = time.perf_counter()
+            answers = get_answers("q", self.db, qid, use_cache=False)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(answers, {"GPT": "A", "Claude": "B"})
+        self.assertLess(elapsed, 0.38)
+        self.assertEqual(self._responses(), [("GPT", "A", "mode=live"), ("Claude", "B", "mode=live")])
+
+    def test_failure_keeps_other_answer_and_raises(self):
+        qid = self.db.save_query("q")
+        with mock.patch("modules.model_invoker._call_openai", side_effect=RuntimeError("down")), mock.patch(
+            "modules.model_invoker._call_anthropic", return_value="B"
+        ), mock.patch("modules.model_invoker.time.sleep"):
+            with self.assertRaises(RuntimeError):
+                get_answers("q", self.db, qid, use_cache=False)
+        self.assertEqual(self._responses(), [("Claude", "B", "mode=live")])
+
+    def test_fallback_mode_is_recorded_per_model(self):
+        qid = self.db.save_query("q")
+        with mock.patch("modules.model_invoker._call_openai", return_value="A"), mock.patch(
+            "modules.model_invoker._call_anthropic", side_effect=RuntimeError("down")
+        ), mock.patch("modules.model_invoker.time.sleep"):
+            answers = get_answers("q", self.db, qid, use_cache=False, allow_mock_fallback=True)
+        self.assertEqual(answers["GPT"], "A")
+        self.assertEqual([r[2] for r in self._responses()], ["mode=live", "mode=fallback_mock"])
+
+    def test_provider_clients_are_reused_and_closed(self):
+        created = []
+
+        class _FakeClient:
+            def __init__(self, api_key, base_url):
+                self.base_url = base_url
+                self.closed = False
+                self.responses = mock.Mock()
+                self.responses.create.return_value = mock.Mock(output_text=" ok ")
+                created.append(self)
+
+            def close(self):
+                self.closed = True
+
+        registry = provider_clients.ProviderClientRegistry()
+        registry.register_factory("openai", _FakeClient)
+        env = {"OPENAI_API_KEY": "k", "OPENAI_BASE_URL": "http://127.0.0.1:9/v1"}
+        with mock.patch.object(provider_clients, "_REGISTRY", registry), mock.patch.dict("os.environ", env):
+            threads = [threading.Thread(target=_call_openai, args=("q",)) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(_call_openai("q"), "ok")
+            self.assertEqual(len(created), 1)
+            self.assertEqual(created[0].base_url, "http://127.0.0.1:9/v1")
+            self.assertEqual(created[0].responses.create.call_count, 5)
+            provider_clients.close_clients()
+        self.assertTrue(created[0].closed)
+        self.assertEqual(len(registry), 0)
+
+    def test_identical_concurrent_questions_share_one_upstream_call(self):
+        calls = {"GPT": 0, "Claude": 0}
+        release = threading.Event()
+
+        def _provider(name):
+            def _call(question):
+                calls[name] += 1
+                release.wait(2)
+                return f"{name} answer"
+
+            return _call
+
+        before = model_invoker.get_coalescing_stats()["coalesced"]
+        results = []
+        with mock.patch("modules.model_invoker._call_openai", side_effect=_provider("GPT")), mock.patch(
+            "modules.model_invoker._call_anthropic", side_effect=_provider("Claude")
+        ):
+
+            def _request():
+                qid = self.db.save_query("same question")
+                results.append(get_answers("same question", self.db, qid, use_cache=True))
+
+            threads = [threading.Thread(target=_request) for _ in range(3)]
+            for t in threads:
+                t.start()
+            deadline = time.monotonic() + 2
+            while model_invoker.get_coalescing_stats()["coalesced"] - before < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(calls, {"GPT": 1, "Claude": 1})
+        self.assertEqual(results, [{"GPT": "GPT answer", "Claude": "Claude answer"}] * 3)
+        self.assertEqual(len(self._responses()), 2)
+        self.assertEqual(model_invoker.get_coalescing_stats()["coalesced"] - before, 4)
+        self.assertEqual(model_invoker.get_coalescing_stats()["in_flight"], 0)
+
+    def test_new_leader_rechecks_cache_before_calling(self):
+        qid = self.db.save_query("q")
+        self.db.save_response(qid, "GPT", "A", usage_info="mode=live")
+        self.db.save_response(qid, "Claude", "B", usage_info="mode=live")
+        real = self.db.get_cached_answers
+        # The first read misses, as if another leader persisted right after it.
+        reads = [lambda *a, **k: {}, real]
+        trace = {}
+        with mock.patch.object(
+            self.db, "get_cached_answers", side_effect=lambda *a, **k: reads.pop(0)(*a, **k)
+        ), mock.patch("modules.model_invoker._call_openai") as gpt, mock.patch(
+            "modules.model_invoker._call_anthropic"
+        ) as claude:
+            answers = get_answers("q", self.db, qid, trace=trace)
+        self.assertEqual(answers, {"GPT": "A", "Claude": "B"})
+        self.assertEqual(trace, {"GPT": "cache", "Claude": "cache"})
+        self.assertFalse(gpt.called or claude.called)
+        self.assertEqual(model_invoker.get_coalescing_stats()["in_flight"], 0)
+
+    def test_scheduler_honours_retry_after_and_backs_off_concurrency(self):
+        clock = [0.0]
+        sleeps = []
+
+        def _sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        class _Throttled(Exception):
+            status_code = 429
+
+            def __init__(self, retry_after):
+                super().__init__("rate limited")
+                self.response = mock.Mock(headers={"retry-after": str(retry_after)})
+
+        class _FakeProvider:
+            def __init__(self, throttle_first):
+                self.remaining = throttle_first
+                self.calls = 0
+
+            def __call__(self):
+                self.calls += 1
+                if self.remaining:
+                    self.remaining -= 1
+                    raise _Throttled(retry_after=3)
+                return "ok"
+
+        scheduler = provider_scheduler.ProviderScheduler(
+            "fake", max_concurrency=8, clock=lambda: clock[0], sleep=_sleep
+        )
+        provider = _FakeProvider(throttle_first=2)
+        self.assertEqual(scheduler.run(provider, retries=2), "ok")
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(sleeps, [3.0, 3.0])
+        stats = scheduler.stats()
+        self.assertEqual(stats["throttled"], 2)
+        self.assertLess(stats["limit"], 8)
+
+        with self.assertRaises(_Throttled):
+            scheduler.run(_FakeProvider(throttle_first=5), retries=1)
+        self.assertEqual(scheduler.stats()["failed"], 1)
+
+    def test_scheduler_rate_limits_and_rejects_unreachable_deadlines(self):
+        clock = [0.0]
+
+        def _sleep(seconds):
+            clock[0] += seconds
+
+        scheduler = provider_scheduler.ProviderScheduler(
+            "fake",
+            requests_per_second=2,
+            tokens_per_second=100,
+            clock=lambda: clock[0],
+            sleep=_sleep,
+        )
+        for _ in range(6):
+            scheduler.run(lambda: "ok", tokens=10)
+        self.assertAlmostEqual(clock[0], 2.0)
+        with self.assertRaises(provider_scheduler.SchedulerRejected):
+            scheduler.run(lambda: "ok", tokens=500, deadline=clock[0] + 1.0)
+        self.assertEqual(scheduler.stats()["rejected"], 1)
+        self.assertEqual(scheduler.run(lambda: "ok", tokens=10, deadline=clock[0] + 1.0), "ok")
+
+    def test_default_scheduler_is_unbounded_and_retries_pay_the_rate_budget(self):
+        scheduler = provider_scheduler.ProviderScheduler("fake")
+        release = threading.Event()
+        threads = [threading.Thread(target=scheduler.run, args=(lambda: release.wait(2),)) for _ in range(100)]
+        for t in threads:
+            t.start()
+        deadline = time.monotonic() + 2
+        while scheduler.stats()["in_flight"] < 100 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual((scheduler.stats()["in_flight"], scheduler.stats()["rejected"]), (100, 0))
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertIsNone(scheduler.stats()["limit"])
+
+        clock = [0.0]
+
+        def _sleep(seconds):
+            clock[0] += seconds
+
+        class _Throttled(Exception):
+            status_code = 429
+
+        calls = []
+
+        def _provider():
+            calls.append(clock[0])
+            if len(calls) < 3:
+                raise _Throttled()
+            return "ok"
+
+        limited = provider_scheduler.ProviderScheduler(
+            "fake", requests_per_second=1, clock=lambda: clock[0], sleep=_sleep
+        )
+        self.assertEqual(limited.run(_provider, retries=2), "ok")
+        # Backoff alone would retry at 0.5 and 1.5; each retry also waits for a request token.
+        self.assertEqual(calls, [0.0, 1.0, 2.0])
+
+    def test_scheduler_bounds_queue_and_concurrency(self):
+        scheduler = provider_scheduler.ProviderScheduler("fake", max_concurrency=1, max_queue=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def _blocking():
+            started.set()
+            release.wait(2)
+            return "ok"
+
+        first = threading.Thread(target=scheduler.run, args=(_blocking,))
+        first.start()
+        started.wait(2)
+        second = threading.Thread(target=scheduler.run, args=(lambda: "ok",))
+        second.start()
+        deadline = time.monotonic() + 2
+        while scheduler.stats()["waiting"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with self.assertRaises(provider_scheduler.SchedulerRejected):
+            scheduler.run(lambda: "ok")
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual(scheduler.stats()["completed"], 2)
+
+    def test_get_answers_goes_through_provider_schedulers(self):
+        qid = self.db.save_query("q")
+        before = provider_scheduler.get_scheduler("openai").stats()["completed"]
+        with mock.patch("modules.model_invoker._call_openai", return_value="A"), mock.patch(
+            "modules.model_invoker._call_anthropic", return_value="B"
+        ):
+            get_answers("q", self.db, qid, use_cache=False)
+        self.assertEqual(provider_scheduler.get_scheduler("openai").stats()["completed"], before + 1)
+
+    def test_latency_budget_hedges_slow_primary(self):
+        release = threading.Event()
+        calls = []
+
+        def _gpt(question):
+            calls.append(question)
+            if len(calls) == 1:
+                release.wait(2)
+                return "A-slow"
+            return "A-hedge"
+
+        qid = self.db.save_query("q")
+        trace = {}
+        before = model_invoker.get_hedge_stats()
+        with mock.patch.dict(provider_scheduler._SCHEDULERS, clear=True), mock.patch(
+            "modules.model_invoker._call_openai", side_effect=_gpt
+        ), mock.patch("modules.model_invoker._call_anthropic", return_value="B"):
+            start = time.perf_counter()
+            answers = get_answers("q", self.db, qid, use_cache=False, latency_budget=0.6, trace=trace)
+            elapsed = time.perf_counter() - start
+            release.set()
+        self.assertEqual(answers, {"GPT": "A-hedge", "Claude": "B"})
+        self.assertEqual(trace, {"GPT": "hedge", "Claude": "primary"})
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(self._responses(), [("GPT", "A-hedge", "mode=live"), ("Claude", "B", "mode=live")])
+        after = model_invoker.get_hedge_stats()
+        delta = {k: after[k] - before[k] for k in after}
+        self.assertEqual(
+            delta,
+            {"hedged": 1, "skipped": 0, "primary_wins": 1, "hedge_wins": 1, "cancelled": 0, "abandoned": 1},
+        )
+
+    def test_busy_hedge_pool_skips_hedging_without_delaying_primaries(self):
+        def _slow(answer):
+            def _call(question):
+                time.sleep(0.2)
+                return answer
+
+            return _call
+
+        qid = self.db.save_query("q")
+        trace = {}
+        before = model_invoker.get_hedge_stats()["skipped"]
+        with mock.patch.dict(provider_scheduler._SCHEDULERS, clear=True), mock.patch.object(
+            model_invoker, "_HEDGE_FREE", threading.BoundedSemaphore(1)
+        ) as slots, mock.patch("modules.model_invoker._call_openai", side_effect=_slow("A")), mock.patch(
+            "modules.model_invoker._call_anthropic", side_effect=_slow("B")
+        ):
+            slots.acquire()  # every hedge slot is taken when the 0.15 s hedge delay passes
+            answers = get_answers("q", self.db, qid, use_cache=False, latency_budget=0.3, trace=trace)
+        self.assertEqual(answers, {"GPT": "A", "Claude": "B"})
+        self.assertEqual(trace, {"GPT": "primary", "Claude": "primary"})
+        self.assertEqual(model_invoker.get_hedge_stats()["skipped"] - before, 2)
+
+    def test_latency_budget_falls_back_to_cache_mock_or_fails(self):
+        release = threading.Event()
+
+        def _stuck(question):
+            release.wait(2)
+            return "late"
+
+        earlier = self.db.save_query("q")
+        self.db.save_response(earlier, "GPT", "A-cached", usage_info="mode=live")
+        patches = (
+            mock.patch.dict(provider_scheduler._SCHEDULERS, clear=True),
+            mock.patch("modules.model_invoker._call_openai", side_effect=_stuck),
+            mock.patch("modules.model_invoker._call_anthropic", side_effect=_stuck),
+        )
+        try:
+            with patches[0], patches[1], patches[2]:
+                trace = {}
+                qid = self.db.save_query("q")
+                answers = get_answers(
+                    "q", self.db, qid, use_cache=False, allow_mock_fallback=True, latency_budget=0.2, trace=trace
+                )
+                self.assertEqual(answers["GPT"], "A-cached")
+                self.assertEqual(answers["Claude"], "Claude mock: 示例回答。")
+                self.assertEqual(trace, {"GPT": "fallback_cache", "Claude": "fallback_mock"})
+
+                with self.assertRaises(model_invoker.LatencyBudgetExceeded):
+                    get_answers("q", self.db, qid, use_cache=False, latency_budget=0.2)
+        finally:
+            release.set()
+        # The cached fallback is not stored again; the mock fallback is recorded as degraded.
+        self.assertEqual(
+            self._responses(), [("GPT", "A-cached", "mode=live"), ("Claude", "Claude mock: 示例回答。", "mode=fallback_mock")]
+        )
+
+    def test_scheduler_learns_latency_percentiles(self):
+        scheduler = provider_scheduler.ProviderScheduler("test")
+        self.assertIsNone(scheduler.latency_percentile(0.95))
+        for latency in range(1, 41):
+            scheduler._on_success(latency / 100)
+        self.assertAlmostEqual(scheduler.latency_percentile(0.5), 0.21)
+        self.assertAlmostEqual(scheduler.latency_percentile(0.95), 0.39)
+
+    def test_circuit_breaker_opens_half_opens_and_closes(self):
+        now = [0.0]
+        breaker = circuit_breaker.CircuitBreaker("test", failure_threshold=2, recovery_timeout=10, clock=lambda: now[0])
+
+        def _fail():
+            raise RuntimeError("down")
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                breaker.call(_fail)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(circuit_breaker.CircuitOpen):
+            breaker.call(lambda: "never")
+        now[0] = 10.0
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # one probe at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        now[0] = 20.0
+        self.assertEqual(breaker.call(lambda: "ok"), "ok")
+        stats = breaker.stats()
+        self.assertEqual(stats["state"], "closed")
+        self.assertEqual(
+            stats["transitions"], {"closed->open": 1, "open->half_open": 2, "half_open->open": 1, "half_open->closed": 1}
+        )
+        self.assertEqual(stats["rejected"], 2)
+
+    def test_open_circuit_serves_degraded_answers_without_calling(self):
+        earlier = self.db.save_query("q")
+        self.db.save_response(earlier, "Claude", "B-cached", usage_info="mode=live")
+        with mock.patch.dict(circuit_breaker._BREAKERS, clear=True), mock.patch(
+            "modules.model_invoker._call_openai", side_effect=RuntimeError("down")
+        ) as gpt, mock.patch("modules.model_invoker._call_anthropic", side_effect=RuntimeError("down")) as claude, mock.patch(
+            "modules.model_invoker.time.sleep"
+        ), mock.patch("modules.provider_scheduler.time.sleep"):
+            circuit_breaker.configure_breaker("openai", failure_threshold=1)
+            circuit_breaker.configure_breaker("anthropic", failure_threshold=1)
+            qid = self.db.save_query("q")
+            get_answers("q", self.db, qid, use_cache=False, allow_mock_fallback=True)
+            calls = gpt.call_count + claude.call_count
+
+            trace = {}
+            answers = get_answers("q", self.db, qid, use_cache=False, allow_mock_fallback=True, trace=trace)
+            self.assertEqual(gpt.call_count + claude.call_count, calls)
+            self.assertEqual(answers, {"GPT": "GPT mock: 示例回答。", "Claude": "B-cached"})
+            self.assertEqual(trace, {"GPT": "fallback_mock", "Claude": "fallback_cache"})
+            with self.assertRaises(circuit_breaker.CircuitOpen):
+                get_answers("q", self.db, qid, use_cache=False)
+            stats = model_invoker.get_breaker_stats()
+        self.assertEqual(stats["openai"]["state"], "open")
+        self.assertEqual(stats["openai"]["transitions"], {"closed->open": 1})
+
+    def test_local_admission_rejections_do_not_trip_the_breaker(self):
+        with mock.patch.dict(circuit_breaker._BREAKERS, clear=True), mock.patch.dict(
+            provider_scheduler._SCHEDULERS, clear=True
+        ), mock.patch("modules.model_invoker._call_openai", return_value="A") as gpt, mock.patch(
+            "modules.model_invoker._call_anthropic", return_value="B"
+        ):
+            circuit_breaker.configure_breaker("openai", failure_threshold=1)
+            provider_scheduler.configure_scheduler("openai", max_queue=0)
+            qid = self.db.save_query("q")
+            for _ in range(3):
+                with self.assertRaises(RuntimeError) as raised:
+                    get_answers("q", self.db, qid, use_cache=False)
+                self.assertIsInstance(raised.exception.__cause__, provider_scheduler.SchedulerRejected)
+            stats = model_invoker.get_breaker_stats()["openai"]
+        self.assertEqual(gpt.call_count, 0)
+        self.assertEqual((stats["state"], stats["failures"], stats["released"]), ("closed", 0, 3))
+        self.assertEqual(stats["transitions"], {})
+
+        now = [0.0]
+        breaker = circuit_breaker.CircuitBreaker("test", failure_threshold=1, recovery_timeout=1, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 1.0
+
+        def _rejected():
+            raise provider_scheduler.SchedulerRejected("queue full")
+
+        with self.assertRaises(provider_scheduler.SchedulerRejected):
+            breaker.call(_rejected)
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())  # the probe slot was given back
+
+    def test_provider_registry_selection_policies_and_stats(self):
+        registry = provider_registry.ProviderRegistry()
+        for name, cost, default in (("A", 0.01, True), ("B", 0.002, True), ("C", 0.0, False)):
+            registry.register(
+                provider_registry.ModelProvider(name, name.lower(), call=lambda q, n=name: n, cost_per_1k_tokens=cost, default=default)
+            )
+        self.assertEqual(registry.select("default"), ["A", "B"])
+        self.assertEqual(registry.select("cheapest"), ["C", "B"])
+        registry.get("B").invoke("q", tokens=1000)
+        registry.get("C")._record(0.5, 0, ok=True)
+        registry.get("A")._record(0.9, 0, ok=True)
+        self.assertEqual(registry.select("fastest"), ["B", "C"])
+        self.assertEqual(asyncio.run(registry.get("A").ainvoke("q")), "A")
+        stats = registry.stats()
+        self.assertEqual(stats["B"]["calls"], 1)
+        self.assertAlmostEqual(stats["B"]["estimated_cost"], 0.002)
+        with self.assertRaises(ValueError):
+            registry.select("random")
+
+    def test_get_answers_fans_out_to_openai_compatible_local_model(self):
+        class _FakeClient:
+            def __init__(self, api_key, base_url):
+                self.chat = mock.Mock()
+                message = mock.Mock(content=" local answer ")
+                self.chat.completions.create.return_value = mock.Mock(choices=[mock.Mock(message=message)])
+
+        clients = provider_clients.ProviderClientRegistry()
+        clients.register_factory("openai", _FakeClient)
+        qid = self.db.save_query("q")
+        with mock.patch.object(provider_clients, "_REGISTRY", clients), mock.patch.object(
+            model_invoker, "PROVIDERS", provider_registry.ProviderRegistry()
+        ), mock.patch("modules.model_invoker._call_openai", return_value="A"):
+            model_invoker.PROVIDERS.register(
+                provider_registry.ModelProvider("GPT", "openai", call=lambda q: model_invoker._call_openai(q), default=True)
+            )
+            model_invoker.register_openai_compatible("Local", "http://127.0.0.1:8000/v1", "llama")
+            trace = {}
+            answers = get_answers("q", self.db, qid, models=["Local", "GPT"], trace=trace)
+            self.assertEqual(list(answers.items()), [("Local", "local answer"), ("GPT", "A")])
+            self.assertEqual(trace, {"Local": "primary", "GPT": "primary"})
+            self.assertEqual(get_answers("q", self.db, qid, models=["Local", "GPT"], trace=trace)["Local"], "local answer")
+            self.assertEqual(trace["Local"], "cache")
+            self.assertEqual(get_answers("q", self.db, qid, mock_mode=True, models=["Local", "GPT"])["Local"], "Local mock: 示例回答。")
+            self.assertEqual(model_invoker.get_provider_stats()["Local"]["calls"], 1)
+
+    def test_record_then_replay_without_network(self):
+        path = str(Path(self._tmp.name) / "calls.replay.db")
+        recorder = response_recorder.ResponseRecorder(path, mode="record")
+        qid = self.db.save_query("q")
+        with mock.patch("modules.model_invoker._call_openai", return_value="A"), mock.patch(
+            "modules.model_invoker._call_anthropic", return_value="B"
+        ), recorder.installed(model_invoker.PROVIDERS):
+            get_answers("q", self.db, qid, use_cache=False)
+        self.assertEqual(recorder.stats()["recorded"], 2)
+        recorder.close()
+
+        slept = []
+        replay = response_recorder.ResponseRecorder(path, mode="replay", latency_scale=0.5, sleep=slept.append)
+        replay.record("GPT", "q", "A2", latency=0.2)
+        with mock.patch("modules.model_invoker._call_openai", side_effect=AssertionError("network")), mock.patch(
+            "modules.model_invoker._call_anthropic", side_effect=AssertionError("network")
+        ), replay.installed(model_invoker.PROVIDERS):
+            first = get_answers("q", self.db, qid, use_cache=False)
+            second = get_answers("q", self.db, qid, use_cache=False)
+            with self.assertRaises(RuntimeError) as ctx:
+                get_answers("unrecorded", self.db, qid, use_cache=False)
+        self.assertIsInstance(ctx.exception.__cause__, response_recorder.ReplayMiss)
+        self.assertEqual(first, {"GPT": "A", "Claude": "B"})
+        self.assertEqual(second["GPT"], "A2")  # repeated questions cycle through recordings
+        self.assertAlmostEqual(slept[-1], 0.1)
+        self.assertEqual(replay.questions(), ["q"])
+        self.assertEqual(replay.stats()["misses"], 2)  # one per model; a miss is not retried
+        replay.close()
+        self.assertIsNotNone(model_invoker.PROVIDERS.get("GPT").stream)
+
+    def test_bulk_answers_dedupe_against_cache_and_write_in_bulk(self):
+        earlier = self.db.save_query("q1")
+        self.db.save_response(earlier, "GPT", "A1", usage_info="mode=live")
+        self.db.save_response(earlier, "Claude", "B1", usage_info="mode=live")
+        with mock.patch("modules.model_invoker._call_openai", side_effect=lambda q: f"A-{q}") as gpt, mock.patch(
+            "modules.model_invoker._call_anthropic", side_effect=lambda q: f"B-{q}"
+        ) as claude, mock.patch.object(self.db, "get_cached_responses", wraps=self.db.get_cached_responses) as lookup:
+            results = list(model_invoker.get_answers_bulk(["q1", "q2", "q2", "q3"], self.db, batch_size=10))
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(gpt.call_count + claude.call_count, 4)
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3])
+        self.assertEqual(results[0]["answers"], {"GPT": "A1", "Claude": "B1"})
+        self.assertEqual(results[0]["cached"], ["GPT", "Claude"])
+        self.assertEqual(results[2]["answers"], {"GPT": "A-q2", "Claude": "B-q2"})
+        self.assertEqual(len(self._responses()), 6)
+
+        batched = list(
+            model_invoker.get_answers_bulk(
+                ["q4", "q5"], self.db, batch_fn=lambda model, qs: [f"{model}:{q}" for q in qs]
+            )
+        )
+        self.assertEqual(batched[1]["answers"], {"GPT": "GPT:q5", "Claude": "Claude:q5"})
+        broken = list(model_invoker.get_answers_bulk(["q6"], self.db, batch_fn=lambda model, qs: []))
+        self.assertIsNone(broken[0]["answers"])
+        self.assertIn("batch returned 0 answers", broken[0]["error"])
+
+    def test_bulk_answers_resume_from_checkpoint(self):
+        checkpoint = str(Path(self._tmp.name) / "bulk.checkpoint.json")
+        questions = [f"question {i}" for i in range(5)]
+        seen = []
+        for result in model_invoker.get_answers_bulk(
+            questions, self.db, mock_mode=True, batch_size=2, checkpoint_path=checkpoint
+        ):
+            seen.append(result["index"])
+            if len(seen) == 3:
+                break  # simulated crash in the middle of the second batch
+        resumed = list(
+            model_invoker.get_answers_bulk(questions, self.db, mock_mode=True, batch_size=2, checkpoint_path=checkpoint)
+        )
+        self.assertEqual([r["index"] for r in resumed], [2, 3, 4])
+        self.assertEqual(resumed[0]["cached"], ["GPT", "Claude"])  # written before the crash
+        self.assertEqual(model_invoker._read_checkpoint(checkpoint), (5, []))
+
+    def test_bulk_resume_retries_failed_questions(self):
+        checkpoint = str(Path(self._tmp.name) / "bulk.checkpoint.json")
+        questions = [f"question {i}" for i in range(5)]
+        down = {"question 1", "question 3"}
+
+        def _batch(model_name, pending):
+            if down & set(pending):
+                raise RuntimeError("provider down")
+            return [f"{model_name}: {q}" for q in pending]
+
+        first = list(
+            model_invoker.get_answers_bulk(
+                questions, self.db, batch_size=1, checkpoint_path=checkpoint, batch_fn=_batch
+            )
+        )
+        self.assertEqual([r["index"] for r in first if r["error"]], [1, 3])
+        self.assertEqual(model_invoker._read_checkpoint(checkpoint), (5, [1, 3]))
+
+        down = {"question 3"}
+        resumed = list(
+            model_invoker.get_answers_bulk(
+                questions, self.db, batch_size=1, checkpoint_path=checkpoint, batch_fn=_batch
+            )
+        )
+        self.assertEqual([r["index"] for r in resumed], [1, 3])
+        self.assertEqual(model_invoker._read_checkpoint(checkpoint), (5, [3]))
+
+        down = set()
+        resumed = list(
+            model_invoker.get_answers_bulk(
+                questions, self.db, batch_size=1, checkpoint_path=checkpoint, batch_fn=_batch
+            )
+        )
+        self.assertEqual([(r["index"], r["error"]) for r in resumed], [(3, None)])
+        self.assertEqual(model_invoker._read_checkpoint(checkpoint), (5, []))
+
+    def _collect(self, agen):
+        async def _run():
+            return [event async for event in agen]
+
+        return asyncio.run(_run())
+
+    def test_incremental_comparator_final_equals_batch(self):
+        a = "X技术专利申请于2020年。该方案可离线执行！太阳系中最大的行星是木星\n结尾"
+        b = "X技术专利申请于2018年。该方案不可离线执行;太阳系最大的行星是木星。"
+        comparator = IncrementalComparator()
+        events = []
+        for start in range(0, max(len(a), len(b)), 3):
+            events += comparator.feed("A", a[start : start + 3])
+            events += comparator.feed("B", b[start : start + 3])
+        kinds = [e["event"] for e in events]
+        self.assertIn("match", kinds)
+        self.assertIn("conflict", kinds)
+        self.assertEqual(comparator.finish(), compare_answers(a, b))
+
+    def test_stream_divergence_emits_events_before_final(self):
+        def _chunks(text):
+            return lambda question: iter([text[i : i + 2] for i in range(0, len(text), 2)])
+
+        gpt = "该方案可离线执行。木星最大。"
+        claude = "该方案不可离线执行。木星最大。"
+        qid = self.db.save_query("q")
+        with mock.patch("modules.model_invoker._stream_openai", side_effect=_chunks(gpt)), mock.patch(
+            "modules.model_invoker._stream_anthropic", side_effect=_chunks(claude)
+        ):
+            events = self._collect(stream_divergence("q", db=self.db, query_id=qid))
+        self.assertEqual(events[-1]["event"], "final")
+        self.assertTrue(any(e["event"] == "conflict" for e in events[:-1]))
+        self.assertEqual(events[-1]["answers"], {"GPT": gpt, "Claude": claude})
+        self.assertEqual(events[-1]["diff"], compare_answers(gpt, claude))
+        self.assertEqual(len(self._responses()), 2)
+
+    def test_stream_divergence_fallback_and_strict_failure(self):
+        def _boom(question):
+            raise RuntimeError("stream down")
+
+        with mock.patch("modules.model_invoker._stream_openai", side_effect=_boom), mock.patch(
+            "modules.model_invoker._stream_anthropic", return_value=iter(["B answer。"])
+        ):
+            events = self._collect(stream_divergence("q", allow_mock_fallback=True))
+        self.assertIn("reset", [e["event"] for e in events])
+        self.assertEqual(events[-1]["answers"]["GPT"], "GPT mock: 示例回答。")
+
+        with mock.patch("modules.model_invoker._stream_openai", side_effect=_boom), mock.patch(
+            "modules.model_invoker._stream_anthropic", return_value=iter(["B answer。"])
+        ):
+            with self.assertRaises(RuntimeError):
+                self._collect(stream_divergence("q"))
+
+
+if __name__ == "__main__":
+    unittest.main()
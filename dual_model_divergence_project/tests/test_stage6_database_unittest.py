@@ -0,0 +1,228 @@
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from main import run_pipeline
+from modules.database import DatabaseManager
+from modules.write_behind import WriteBehindDatabase, WriteBehindFull
+
+
+class Stage6DatabaseTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self._tmp.name) / "stage6.db")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _count(self, db, table):
+        with db._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_persistent_mode_reuses_configured_connections(self):
+        db = DatabaseManager(self.db_path, persistent=True)
+        with mock.patch.object(db, "_open", wraps=db._open) as opened:
+            db.init_db()
+            qid = db.save_query("q")
+            db.save_response(qid, "GPT", "A", usage_info="mode=live")
+            self.assertEqual(db.get_cached_response("q", "GPT", response_mode="live"), "A")
+            self.assertEqual(db.get_cached_response("q", "GPT", response_mode="live"), "A")
+            self.assertEqual(opened.call_count, 2)  # one writer, one reader for this thread
+
+            answers = []
+            thread = threading.Thread(target=lambda: answers.append(db.get_cached_response("q", "GPT", "live")))
+            thread.start()
+            thread.join()
+            self.assertEqual(answers, ["A"])
+            self.assertEqual(opened.call_count, 3)
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            db.save_response(10**6, "GPT", "orphan")  # foreign_keys is on; the failed write rolls back
+        self.assertEqual(self._count(db, "model_responses"), 1)
+
+        db.close()
+        self.assertIsNone(db._writer)
+        self.assertEqual(len(db._readers), 0)
+        self.assertEqual(db.get_cached_response("q", "GPT", response_mode="live"), "A")  # reopens lazily
+        db.close()
+
+    def test_concurrent_pipelines_share_a_persistent_manager(self):
+        with DatabaseManager(self.db_path, persistent=True) as db:
+            db.init_db()
+            errors = []
+
+            def _run(i):
+                try:
+                    run_pipeline(f"question {i % 2}", self.db_path, mock_mode=True, db=db)
+                except Exception as e:  # pragma: no cover - surfaced by the assertion below
+                    errors.append(e)
+
+            threads = [threading.Thread(target=_run, args=(i,)) for i in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(errors, [])
+            self.assertEqual(self._count(db, "queries"), 6)
+            self.assertEqual(self._count(db, "fused_answers"), 6)
+
+    def test_unit_of_work_commits_one_transaction_with_real_query_ids(self):
+        db = DatabaseManager(self.db_path)
+        db.init_db()
+        with mock.patch.object(db, "_connect", wraps=db._connect) as connects:
+            with db.unit_of_work() as uow:
+                qid = uow.save_query("q")
+                self.assertLess(qid, 0)
+                uow.save_response(qid, "GPT", "A", usage_info="mode=live")
+                uow.save_divergence(qid, "s", "{}")
+                for i in range(3):
+                    uow.save_evidence(qid, f"c{i}", "text", "src", "supported")
+                self.assertEqual(self._count(db, "queries"), 0)  # nothing written yet
+                connects.reset_mock()
+            self.assertEqual(connects.call_count, 1)
+        real = uow.resolve(qid)
+        self.assertGreater(real, 0)
+        with db._connect() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM evidence WHERE query_id = ?", (real,)).fetchone()[0], 3)
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            with db.unit_of_work() as uow:
+                uow.save_query("q2")
+                uow.save_response(10**6, "GPT", "orphan")  # invalid foreign key aborts the whole unit
+        self.assertEqual(self._count(db, "queries"), 1)
+
+        with self.assertRaises(RuntimeError):
+            with db.unit_of_work(commit_on_error=True) as uow:
+                uow.save_response(uow.save_query("q3"), "Claude", "B", usage_info="mode=live")
+                raise RuntimeError("GPT failed")
+        self.assertEqual(db.get_cached_response("q3", "Claude", response_mode="live"), "B")
+
+    def test_pipeline_writes_in_a_single_transaction(self):
+        db = DatabaseManager(self.db_path)
+        db.init_db()
+        with mock.patch.object(db, "_connect", wraps=db._connect) as connects:
+            run_pipeline("X技术专利申请于哪一年份？", self.db_path, mock_mode=True, use_cache=False, enable_evidence=True, db=db)
+        self.assertEqual(connects.call_count, 1)
+        for table in ("queries", "model_responses", "divergences", "structures", "fused_answers"):
+            self.assertGreater(self._count(db, table), 0, table)
+
+    def test_init_db_backfills_question_hash_for_old_databases(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE queries (id INTEGER PRIMARY KEY AUTOINCREMENT, question_text TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+                CREATE TABLE model_responses (id INTEGER PRIMARY KEY AUTOINCREMENT, query_id INTEGER NOT NULL,
+                    model_name TEXT NOT NULL, response_text TEXT NOT NULL, usage_info TEXT,
+                    response_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+                INSERT INTO queries(question_text) VALUES ('Q'), ('Q');
+                INSERT INTO model_responses(query_id, model_name, response_text, usage_info) VALUES
+                    (1, 'GPT', 'old', 'mode=live'), (2, 'GPT', 'new', 'mode=live'),
+                    (2, 'Claude', 'mock', 'mode=mock'), (2, 'Claude', 'v2', 'mode=mock_v2');
+                """
+            )
+        db = DatabaseManager(self.db_path)
+        db.init_db()
+        db.init_db()  # the migration runs once
+        self.assertEqual(self._count(db, "questions"), 1)  # duplicate queries rows were interned
+        self.assertEqual(self._count(db, "runs"), 2)
+        self.assertEqual(db.get_cached_answers("Q", ["GPT", "Claude"], response_mode="live"), {"GPT": "new"})
+        self.assertEqual(db.get_cached_answers("Q", ["GPT", "Claude"], response_mode="mock"), {"Claude": "mock"})
+        self.assertEqual(db.get_cached_answers(" Q ", ["GPT", "Claude"]), {"GPT": "new", "Claude": "v2"})
+        self.assertEqual(db.get_cached_responses(["Q", "R"], ["GPT"], "live"), {("Q", "GPT"): "new"})
+
+        qid = db.save_query("Q")
+        db.save_response(qid, "Claude", "live answer", usage_info="mode=live")
+        self.assertEqual(db.get_cached_response("Q", "Claude", response_mode="live"), "live answer")
+        with db._connect() as conn:
+            plan = " ".join(
+                row[-1]
+                for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT id FROM model_responses WHERE question_hash = ? AND model_name = ? "
+                    "AND mode = ? ORDER BY id DESC LIMIT 1",
+                    ("h", "GPT", "live"),
+                )
+            )
+        self.assertIn("idx_model_responses_cache", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_repeated_questions_share_one_interned_row(self):
+        db = DatabaseManager(self.db_path)
+        db.init_db()
+        ids = [db.save_query(q) for q in ("Q", "Q", "R", "Q")]
+        with db.unit_of_work() as uow:
+            uow.save_response(uow.save_query("Q"), "GPT", "A", usage_info="mode=live")
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(self._count(db, "questions"), 2)
+        self.assertEqual(self._count(db, "runs"), 5)
+        with db._connect() as conn:
+            rows = conn.execute("SELECT question_text FROM queries ORDER BY id").fetchall()
+            self.assertEqual([r[0] for r in rows], ["Q", "Q", "R", "Q", "Q"])
+            self.assertEqual(conn.execute("PRAGMA foreign_key_check").fetchall(), [])
+        self.assertEqual(db.get_cached_response("Q", "GPT", response_mode="live"), "A")
+
+
+    def test_write_behind_serves_queued_answers_and_flushes_in_batches(self):
+        db = DatabaseManager(self.db_path)
+        db.init_db()
+        store = WriteBehindDatabase(db, batch_size=16)
+        gate = threading.Event()
+        write = store._write_batch
+        store._write_batch = lambda conn, batch: (gate.wait(), write(conn, batch))
+        for i in range(5):
+            run_pipeline(f"question {i}", self.db_path, mock_mode=True, use_cache=False, db=store)
+        self.assertEqual(self._count(db, "fused_answers"), 0)  # still queued
+        answer = store.get_cached_response("question 3", "GPT", response_mode="mock")
+        self.assertTrue(answer)  # served from the overlay
+        self.assertEqual(store.get_cached_answers("question 3", ["GPT"]), {"GPT": answer})
+        self.assertIsNone(db.get_cached_response("question 3", "GPT"))
+        gate.set()
+        store.flush()
+        self.assertEqual(self._count(db, "fused_answers"), 5)
+        self.assertEqual(db.get_cached_response("question 3", "GPT", response_mode="mock"), answer)
+        stats = store.stats()
+        self.assertEqual((stats["written"], stats["overlay"], stats["queue_depth"]), (5, 0, 0))
+        self.assertLessEqual(stats["batches"], 2)  # first unit alone, the rest grouped
+        store.close()
+        with self.assertRaises(RuntimeError):
+            store.save_response(1, "GPT", "late")
+
+    def test_write_behind_backpressure_and_failure_isolation(self):
+        db = DatabaseManager(self.db_path)
+        db.init_db()
+        qid = db.save_query("q")
+        gate = threading.Event()
+        for policy in ("reject", "inline"):
+            gate.clear()
+            store = WriteBehindDatabase(db, max_queue=1, backpressure=policy)
+            write = store._write_batch
+            store._write_batch = lambda conn, batch, write=write: (gate.wait(), write(conn, batch))
+            store.save_response(qid, "GPT", "taken by the writer", usage_info="mode=live")
+            while store.stats()["queue_depth"]:
+                time.sleep(0.001)  # wait until the writer holds the first unit
+            store.save_response(qid, "GPT", "queued", usage_info="mode=live")
+            if policy == "reject":
+                with self.assertRaises(WriteBehindFull):
+                    store.save_response(qid, "GPT", "rejected", usage_info="mode=live")
+            else:
+                store.save_response(qid, "GPT", "inline", usage_info="mode=live")
+                self.assertEqual(db.get_cached_response("q", "GPT", response_mode="live"), "inline")
+            gate.set()
+            store.close()
+            self.assertEqual(store.stats()[{"reject": "rejected", "inline": "inline"}[policy]], 1)
+        self.assertEqual(self._count(db, "model_responses"), 5)
+
+        with WriteBehindDatabase(db, durability="committed") as store:
+            with self.assertRaises(sqlite3.IntegrityError):
+                store.save_response(10**6, "GPT", "orphan")  # committed durability surfaces the error
+            store.save_response(qid, "Claude", "B", usage_info="mode=live")
+            self.assertEqual(db.get_cached_response("q", "Claude", response_mode="live"), "B")  # already written
+            self.assertEqual(store.stats()["failed"], 1)
+            self.assertIsInstance(store.last_error, sqlite3.IntegrityError)
+
+if __name__ == "__main__":
+    unittest.main()